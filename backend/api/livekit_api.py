@@ -1,181 +1,107 @@
-from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect, status
+from fastapi import APIRouter, HTTPException, WebSocket
 import os
-import jwt
 import time
-import json
-from typing import Optional, Dict
+from typing import List, Optional
 from pydantic import BaseModel
 
+from services.connection_registry import ConnectionRegistry
+from services.ws_session import run_chat_session
+from services.backplane import backplane
+from services.room_state import room_state
+from services.livekit_tokens import LiveKitTokenService
+
 router = APIRouter()
 
 # LiveKit configuration
 LIVEKIT_API_KEY = os.getenv("LIVEKIT_API_KEY", "devkey")
 LIVEKIT_API_SECRET = os.getenv("LIVEKIT_API_SECRET", "secret")
 LIVEKIT_HOST = os.getenv("LIVEKIT_HOST", "http://localhost:7880")
+LIVEKIT_TOKEN_TTL = int(os.getenv("LIVEKIT_TOKEN_TTL", "3600"))
+# Cached tokens are reissued once they have less than this many seconds left
+LIVEKIT_TOKEN_REFRESH_MARGIN = int(os.getenv("LIVEKIT_TOKEN_REFRESH_MARGIN", "300"))
 
-# Store active connections
-active_connections: Dict[str, WebSocket] = {}
+token_service = LiveKitTokenService(
+    LIVEKIT_API_KEY, LIVEKIT_API_SECRET,
+    ttl_seconds=LIVEKIT_TOKEN_TTL, refresh_margin=LIVEKIT_TOKEN_REFRESH_MARGIN
+)
 
 class RoomRequest(BaseModel):
     room_name: str
+    metadata: Optional[str] = None
 
 class TokenRequest(BaseModel):
     room_name: str
     identity: str
     name: Optional[str] = None
+    role: str = "participant"  # see ROLE_GRANTS; grants are never taken from the client
+
+class PanelMember(BaseModel):
+    identity: str
+    name: Optional[str] = None
+    role: str = "participant"
+
+class PanelTokenRequest(BaseModel):
+    room_name: str
+    participants: List[PanelMember]
 
 @router.post("/create-room")
 async def create_room(request: RoomRequest):
     try:
-        return {
-            "room": {
-                "name": request.room_name,
-                "num_participants": len([c for c in active_connections.values() if c.room_name == request.room_name]),
-                "metadata": "",
-                "creation_time": int(time.time())
-            }
-        }
+        # Occupancy is maintained by the connection registries on join/leave
+        room = room_state.create(request.room_name, request.metadata)
+        return {"room": room.to_dict()}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/rooms")
+async def list_live_rooms():
+    # Rooms with someone connected right now, for the HR dashboard
+    rooms = sorted(room_state.live_rooms(), key=lambda room: room.creation_time)
+    return {"rooms": [room.to_dict(include_participants=True) for room in rooms]}
+
+@router.get("/rooms/{room_name}")
+async def get_room(room_name: str):
+    room = room_state.get(room_name)
+    if room is None:
+        raise HTTPException(status_code=404, detail="Room not found")
+    return {"room": room.to_dict(include_participants=True)}
+
 @router.post("/get-token")
 async def get_token(request: TokenRequest):
     try:
-        # Create a JWT token for LiveKit
-        now = int(time.time())
-        exp = now + 3600  # Token expires in 1 hour
-
-        # Create the token payload
-        payload = {
-            "iss": LIVEKIT_API_KEY,
-            "sub": request.identity,
-            "exp": exp,
-            "nbf": now,
-            "name": request.name or request.identity,
-            "video": {
-                "room": request.room_name,
-                "roomJoin": True
-            }
-        }
-
-        # Sign the token
-        token = jwt.encode(
-            payload,
-            LIVEKIT_API_SECRET,
-            algorithm="HS256"
-        )
+        issued = token_service.issue(request.room_name, request.identity, request.name, request.role)
+        return {"token": issued["token"]}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        return {"token": token}
+@router.post("/get-tokens")
+async def get_panel_tokens(request: PanelTokenRequest):
+    # Tokens for a whole interview panel (candidate, interviewers, observers) in one call
+    try:
+        started = time.perf_counter()
+        tokens = {
+            member.identity: token_service.issue(request.room_name, member.identity, member.name, member.role)
+            for member in request.participants
+        }
+        elapsed = time.perf_counter() - started
+        return {
+            "room_name": request.room_name,
+            "tokens": tokens,
+            "tokens_per_second": round(len(tokens) / elapsed) if elapsed > 0 else None
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}
-
-    async def connect(self, websocket: WebSocket, room_name: str, identity: str):
-        await websocket.accept()
-        connection_id = f"{room_name}:{identity}"
-        self.active_connections[connection_id] = websocket
-        return connection_id
-
-    def disconnect(self, connection_id: str):
-        if connection_id in self.active_connections:
-            del self.active_connections[connection_id]
-
-    async def broadcast_to_room(self, room_name: str, message: str, sender: str, exclude: str = None):
-        for conn_id, conn in self.active_connections.items():
-            if conn_id.startswith(f"{room_name}:") and conn_id != exclude:
-                try:
-                    await conn.send_text(json.dumps({
-                        "type": "message",
-                        "message": message,
-                        "sender": sender
-                    }))
-                except:
-                    pass
-
-manager = ConnectionManager()
+@router.get("/token-stats")
+async def get_token_stats():
+    return token_service.stats()
+
+manager = ConnectionRegistry("livekit", backplane, room_state=room_state)
 
 @router.websocket("/ws/{room_name}/{identity}")
-async def websocket_endpoint(websocket: WebSocket, room_name: str, identity: str):
-    connection_id = None
-    try:
-        print(f"Attempting WebSocket connection for room: {room_name}, identity: {identity}")
-        
-        # Accept the connection with CORS headers
-        await websocket.accept()
-        connection_id = f"{room_name}:{identity}"
-        manager.active_connections[connection_id] = websocket
-        
-        print(f"WebSocket connection accepted: {connection_id}")
-        
-        # Send welcome message
-        welcome_message = json.dumps({
-            "type": "system",
-            "message": f"Welcome to room {room_name}!",
-            "sender": "system"
-        })
-        print(f"Sending welcome message: {welcome_message}")
-        await websocket.send_text(welcome_message)
-        
-        while True:
-            try:
-                data = await websocket.receive_text()
-                print(f"Received message from {connection_id}: {data}")
-                
-                # Parse the incoming message
-                try:
-                    message_data = json.loads(data)
-                    if isinstance(message_data, str):
-                        message_data = {"message": message_data}
-                except json.JSONDecodeError:
-                    message_data = {"message": data}
-                
-                # Broadcast the message to the room
-                broadcast_message = message_data.get("message", data)
-                print(f"Broadcasting message: {broadcast_message}")
-                await manager.broadcast_to_room(
-                    room_name,
-                    broadcast_message,
-                    identity,
-                    connection_id
-                )
-            except WebSocketDisconnect:
-                print(f"WebSocket disconnected: {connection_id}")
-                break
-            except Exception as e:
-                print(f"Error processing message: {str(e)}")
-                error_message = json.dumps({
-                    "type": "error",
-                    "message": f"Error processing message: {str(e)}",
-                    "sender": "system"
-                })
-                await websocket.send_text(error_message)
-    except WebSocketDisconnect:
-        print(f"Client disconnected: {connection_id}")
-    except Exception as e:
-        print(f"WebSocket error: {str(e)}")
-        if connection_id:
-            try:
-                await websocket.send_text(json.dumps({
-                    "type": "error",
-                    "message": f"Connection error: {str(e)}",
-                    "sender": "system"
-                }))
-            except:
-                pass
-    finally:
-        if connection_id:
-            print(f"Cleaning up connection: {connection_id}")
-            manager.disconnect(connection_id)
-            try:
-                # Notify other participants
-                await manager.broadcast_to_room(
-                    room_name,
-                    f"{identity} has left the room",
-                    "system",
-                    connection_id
-                )
-            except Exception as e:
-                print(f"Error broadcasting disconnect message: {str(e)}") 
\ No newline at end of file
+async def websocket_endpoint(websocket: WebSocket, room_name: str, identity: str, format: str = "json"):
+    await run_chat_session(websocket, manager, room_name, identity, format)
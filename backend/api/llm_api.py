@@ -1,15 +1,46 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
-import ollama
+from typing import Dict, List, Optional
+from contextlib import asynccontextmanager
 import json
+import os
+import time
 from models.interview_evaluation import InterviewEvaluation
-from db import get_db
+from models.evaluation_job import EvaluationJob
+from db import get_db, SessionLocal
 from fastapi import Depends
 from sqlalchemy.orm import Session
+from services.llm_client import llm_client, QuestionStreamParser
+from services.interview_sessions import InterviewSessionStore, truncate_to_token_budget
+from services.evaluation_queue import EvaluationQueue
+from services.json_repair import extract_json
+from services.metrics import metrics
+from services.speculation import QuestionSpeculator
+from services.llm_cache import LLMResponseCache
 
 router = APIRouter()
 
+# STRUCTURED_OUTPUT=0 lets the model answer free-form (parsing still repairs what it can)
+STRUCTURED_OUTPUT = os.getenv("STRUCTURED_OUTPUT", "1").lower() in ("1", "true", "yes")
+# Ollama constrains sampling to valid JSON
+STRUCTURED_OPTIONS = {"format": "json"} if STRUCTURED_OUTPUT else {}
+NEXT_ACTIONS = ("follow_up", "new_topic", "end_interview")
+
+# Identical requests (page reloads, client retries) reuse the earlier generation
+llm_cache = LLMResponseCache(
+    max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024")),
+    ttl_seconds=float(os.getenv("LLM_CACHE_TTL", "3600")),
+    enabled=os.getenv("LLM_CACHE", "1").lower() in ("1", "true", "yes")
+)
+
+# Long resumes are cut to this many tokens before they reach the prompt
+RESUME_TOKEN_BUDGET = int(os.getenv("RESUME_TOKEN_BUDGET", "1000"))
+# Ollama context carried between turns; past this the next turn starts from the prefix again
+interview_sessions = InterviewSessionStore(
+    max_context_tokens=int(os.getenv("LLM_MAX_CONTEXT_TOKENS", "2048"))
+)
+
 class InterviewContext(BaseModel):
     resume: str
     job_description: str
@@ -17,6 +48,8 @@ class InterviewContext(BaseModel):
     current_question: Optional[str] = None
     candidate_answer: Optional[str] = None
     interview_history: Optional[List[dict]] = None
+    session_id: Optional[str] = None  # e.g. the room name; enables context reuse across turns
+    use_cache: bool = True  # False forces a fresh generation
 
 class LLMResponse(BaseModel):
     question: str
@@ -27,20 +60,40 @@ class LLMResponse(BaseModel):
 class EvaluationRequest(BaseModel):
     candidate_id: int
     conversation: list
+    use_cache: bool = True
 
-@router.post("/generate_question")
-async def generate_question(context: InterviewContext):
-    try:
-        # Construct the prompt
-        prompt = f"""You are an AI interviewer for a position. Here's the context:
+class BulkEvaluationRequest(BaseModel):
+    candidate_ids: List[int]
+    # Optional conversation per candidate; otherwise the one from their latest evaluation job
+    conversations: Optional[Dict[int, list]] = None
+
+def question_cache_key(context: InterviewContext) -> str:
+    # Only the fields that end up in the prompt
+    fields = context.model_dump(include={"resume", "job_description", "experience", "current_question", "candidate_answer"})
+    return LLMResponseCache.make_key(llm_client.model, "question", {**fields, "structured": STRUCTURED_OUTPUT})
+
+def evaluation_cache_key(candidate_id: int, conversation: list) -> str:
+    # Per candidate: two candidates with the same (e.g. greeting-only) conversation each get their own row
+    turns = [{"role": turn.get("role"), "content": turn.get("content")} for turn in conversation]
+    return LLMResponseCache.make_key(llm_client.model, "evaluation", {
+        "candidate_id": candidate_id, "conversation": turns, "structured": STRUCTURED_OUTPUT
+    })
 
-Resume: {context.resume}
+def build_prompt_prefix(context: InterviewContext) -> str:
+    # Identical on every turn of an interview, so Ollama can reuse it
+    return f"""You are an AI interviewer for a position. Here's the context:
+
+Resume: {truncate_to_token_budget(context.resume, RESUME_TOKEN_BUDGET)}
 Job Description: {context.job_description}
-Experience: {context.experience}
 
 """
-        if context.current_question and context.candidate_answer:
-            prompt += f"""
+
+def build_turn_prompt(context: InterviewContext) -> str:
+    prompt = f"""Experience: {context.experience}
+
+"""
+    if context.current_question and context.candidate_answer:
+        prompt += f"""
 Previous Question: {context.current_question}
 Candidate's Answer: {context.candidate_answer}
 
@@ -58,8 +111,8 @@ Format your response as JSON:
     "next_action": "follow_up"
 }}
 """
-        else:
-            prompt += """
+    else:
+        prompt += """
 Generate the first question to start the interview. Focus on their experience and skills.
 
 Format your response as JSON:
@@ -71,63 +124,299 @@ Format your response as JSON:
 }
 """
 
-        # Get response from Ollama
-        response = ollama.generate(
-            model="mistral",
-            prompt=prompt
+    return prompt
+
+def build_question_prompt(context: InterviewContext) -> str:
+    return build_prompt_prefix(context) + build_turn_prompt(context)
+
+@asynccontextmanager
+async def question_turn(context: InterviewContext):
+    """Yield (session, generate kwargs) for this turn.
+
+    Without a session_id every call sends the whole prompt. With one, turns
+    of the same interview run one at a time and continue from the previous
+    turn's Ollama context instead of re-sending the resume and job description.
+    """
+    if not context.session_id:
+        yield None, {"prompt": build_question_prompt(context)}
+        return
+    session = interview_sessions.get_or_create(context.session_id, build_prompt_prefix(context))
+    async with session.lock:
+        yield session, session.request(build_turn_prompt(context))
+
+def parse_llm_json(text: str, kind: str) -> Optional[dict]:
+    # Counted per kind so /parse_stats shows how often the model's JSON needs help
+    result, repaired = extract_json(text)
+    outcome = "failed" if result is None else "repaired" if repaired else "ok"
+    metrics.incr(f"llm.{kind}_parse.{outcome}")
+    return result
+
+def coerce_score(value) -> Optional[float]:
+    try:
+        score = float(str(value).strip().rstrip("%"))
+    except (TypeError, ValueError):
+        return None
+    if 1 < score <= 100:
+        score /= 100  # "85" or "85%"
+    return min(max(score, 0.0), 1.0)
+
+def parse_question_response(text: str) -> LLMResponse:
+    # Parse the response, repairing near-JSON instead of discarding it
+    result = parse_llm_json(text, "question")
+    if result and isinstance(result.get("question"), str) and result["question"].strip():
+        feedback = result.get("feedback")
+        next_action = result.get("next_action")
+        return LLMResponse(
+            question=result["question"].strip(),
+            feedback=feedback if isinstance(feedback, str) else None,
+            score=coerce_score(result.get("score")),
+            next_action=next_action if next_action in NEXT_ACTIONS else "new_topic"
         )
+    # Fallback if the response isn't usable JSON
+    return LLMResponse(
+        question=text,
+        next_action="new_topic"
+    )
 
-        # Parse the response
-        try:
-            result = json.loads(response['response'])
-            return LLMResponse(**result)
-        except json.JSONDecodeError:
-            # Fallback if the response isn't valid JSON
-            return LLMResponse(
-                question=response['response'],
-                next_action="new_topic"
-            )
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def speculate_question(context: InterviewContext, answer: str):
+    # Same prompt the end-of-turn request will build, with the answer so far;
+    # the session is read but only updated if this result gets used
+    context = context.model_copy(update={"candidate_answer": answer})
+    if context.session_id:
+        session = interview_sessions.get_or_create(context.session_id, build_prompt_prefix(context))
+        request = session.request(build_turn_prompt(context))
+    else:
+        request = {"prompt": build_question_prompt(context)}
+    response = await llm_client.generate(**request, **STRUCTURED_OPTIONS)
+    return parse_question_response(response['response']), response
+
+# Pregenerates the next question from live transcripts of the room's audio stream.
+# Off by default: each speculation is a full extra generation, which competes
+# with the real end-of-turn request unless the LLM host has capacity to spare
+speculator = QuestionSpeculator(
+    speculate_question,
+    enabled=os.getenv("SPECULATIVE_QUESTIONS", "0").lower() in ("1", "true", "yes")
+)
+
+async def take_speculation(context: InterviewContext) -> Optional[LLMResponse]:
+    if not (context.session_id and context.candidate_answer):
+        return None
+    speculated = await speculator.take(context.session_id, context.candidate_answer)
+    if not speculated:
+        return None
+    result, response = speculated
+    session = interview_sessions.get_or_create(context.session_id, build_prompt_prefix(context))
+    async with session.lock:
+        session.update(response)
+    return result
+
+def finish_turn(context: InterviewContext, result: LLMResponse, source: str):
+    # source: "speculated", "generated" or "cached"
+    if not context.session_id:
+        return
+    # Perceived turn latency: candidate stopped talking -> next question ready
+    ended = speculator.speech_ended_at(context.session_id)
+    if ended and context.candidate_answer:
+        metrics.observe(f"turn.latency_{source}", time.monotonic() - ended)
+    speculator.begin_turn(context.session_id, context.model_copy(update={
+        "current_question": result.question,
+        "candidate_answer": None
+    }))
+
+@router.post("/generate_question")
+async def generate_question(context: InterviewContext):
+    try:
+        cache_key = question_cache_key(context)
+        cached = llm_cache.get(cache_key) if context.use_cache else None
+        if cached:
+            result = LLMResponse(**cached)
+            finish_turn(context, result, "cached")
+            return result
+
+        result = await take_speculation(context)
+        if result:
+            llm_cache.put(cache_key, result.model_dump())
+            finish_turn(context, result, "speculated")
+            return result
+
+        # Get response from Ollama without blocking the event loop
+        async with question_turn(context) as (session, request):
+            response = await llm_client.generate(**request, **STRUCTURED_OPTIONS)
+            if session:
+                session.update(response)
+        result = parse_question_response(response['response'])
+        llm_cache.put(cache_key, result.model_dump())
+        finish_turn(context, result, "generated")
+        return result
 
     except Exception as e:
         return {"error": str(e)}
 
-@router.post("/evaluate_candidate")
-async def evaluate_candidate(
-    req: EvaluationRequest,
-    db: Session = Depends(get_db)
-):
-    candidate_id = req.candidate_id
-    conversation = req.conversation
+@router.post("/generate_question/stream")
+async def generate_question_stream(context: InterviewContext):
+    """Server-sent events: "token" per generated token, "sentence" as soon as
+    a sentence of the question is complete (ready for TTS), then "done" with
+    the parsed response."""
+    async def events():
+        parser = QuestionStreamParser()
+        try:
+            cache_key = question_cache_key(context)
+            cached = llm_cache.get(cache_key) if context.use_cache else None
+            if cached:
+                for sentence in QuestionStreamParser.split_text(cached["question"]):
+                    yield sse_event("sentence", {"text": sentence})
+                finish_turn(context, LLMResponse(**cached), "cached")
+                yield sse_event("done", cached)
+                return
+            result = await take_speculation(context)
+            if result:
+                llm_cache.put(cache_key, result.model_dump())
+                for sentence in QuestionStreamParser.split_text(result.question):
+                    yield sse_event("sentence", {"text": sentence})
+                finish_turn(context, result, "speculated")
+                yield sse_event("done", result.model_dump())
+                return
+            async with question_turn(context) as (session, request):
+                async for chunk in llm_client.stream(**request, **STRUCTURED_OPTIONS):
+                    token = chunk.get("response", "")
+                    if token:
+                        yield sse_event("token", {"text": token})
+                    for sentence in parser.feed(token):
+                        yield sse_event("sentence", {"text": sentence})
+                    if session and chunk.get("done"):
+                        session.update(chunk)
+            result = parse_question_response(parser.text)
+            if not parser.found:
+                # Not JSON after all: the whole reply is the question
+                for sentence in QuestionStreamParser.split_text(result.question):
+                    yield sse_event("sentence", {"text": sentence})
+            llm_cache.put(cache_key, result.model_dump())
+            finish_turn(context, result, "generated")
+            yield sse_event("done", result.model_dump())
+        except Exception as e:
+            yield sse_event("error", {"error": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/parse_stats")
+async def get_parse_stats():
+    counters = metrics.snapshot()["counters"]
+    stats = {}
+    for kind in ("question", "evaluation"):
+        counts = {outcome: counters.get(f"llm.{kind}_parse.{outcome}", 0) for outcome in ("ok", "repaired", "failed")}
+        total = sum(counts.values())
+        counts["success_rate"] = round((counts["ok"] + counts["repaired"]) / total, 3) if total else None
+        stats[kind] = counts
+    return stats
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    return llm_cache.stats()
+
+@router.get("/sessions")
+async def get_session_stats():
+    return interview_sessions.stats()
+
+@router.delete("/sessions/{session_id}")
+async def end_session(session_id: str):
+    speculator.end_room(session_id)
+    return {"dropped": interview_sessions.drop(session_id)}
+
+async def run_evaluation(candidate_id: int, conversation: list):
     # Compose prompt and call LLM as before...
     prompt = "Evaluate the following interview conversation:\n"
     for turn in conversation:
         prompt += f"{turn['role']}: {turn['content']}\n"
-    prompt += "\nProvide a summary, strengths, weaknesses, and a final score (0-1) as JSON."
+    prompt += """
+Provide a summary, strengths, weaknesses, and a final score (0-1) as JSON:
+{"summary": "...", "strengths": ["..."], "weaknesses": ["..."], "score": 0.75}"""
 
     # Call your LLM (Ollama, OpenAI, etc.)
-    response = ollama.generate(
-        model="mistral",
-        prompt=prompt
-    )
+    response = await llm_client.generate(prompt, **STRUCTURED_OPTIONS)
     evaluation_text = response['response']
-    # Optionally parse score from response
-    score = None
-    try:
-        import json
-        parsed = json.loads(evaluation_text)
-        score = parsed.get("score")
-    except Exception:
-        pass
-
-    evaluation = InterviewEvaluation(
-        candidate_id=candidate_id,
-        evaluation_text=evaluation_text,
-        score=score
-    )
-    db.add(evaluation)
-    db.commit()
-    db.refresh(evaluation)
-    return {"evaluation": evaluation_text, "score": score}
+    parsed = parse_llm_json(evaluation_text, "evaluation")
+    score = coerce_score(parsed.get("score")) if parsed else None
+    llm_cache.put(evaluation_cache_key(candidate_id, conversation), {"evaluation": evaluation_text, "score": score})
+    return evaluation_text, score
+
+# Evaluations run as persisted background jobs, EVALUATION_WORKERS at a time
+evaluation_queue = EvaluationQueue(
+    run_evaluation,
+    SessionLocal,
+    workers=int(os.getenv("EVALUATION_WORKERS", "2")),
+    timeout=float(os.getenv("EVALUATION_TIMEOUT", "180"))
+)
+# How long /evaluate_candidate waits for its job before answering 202
+EVALUATION_WAIT_SECONDS = float(os.getenv("EVALUATION_WAIT_SECONDS", "60"))
+
+@router.on_event("startup")
+async def start_evaluation_queue():
+    evaluation_queue.start()
+
+def latest_conversation(db: Session, candidate_id: int) -> list:
+    # The conversation the candidate was last evaluated on, as the meeting page sent it
+    job = db.query(EvaluationJob).filter(EvaluationJob.candidate_id == candidate_id) \
+        .order_by(EvaluationJob.created_at.desc()).first()
+    return job.conversation if job and job.conversation else []
+
+@router.post("/evaluate_candidate")
+async def evaluate_candidate(
+    req: EvaluationRequest,
+    db: Session = Depends(get_db)
+):
+    # A retry of an evaluation that already ran: same answer, no new job or row
+    cached = llm_cache.get(evaluation_cache_key(req.candidate_id, req.conversation)) if req.use_cache else None
+    if cached:
+        return {**cached, "cached": True}
+    job = evaluation_queue.submit(db, req.candidate_id, req.conversation)
+    if not await evaluation_queue.wait(job.id, EVALUATION_WAIT_SECONDS):
+        # LLM is slow or down: don't hold the request, let the client poll
+        return JSONResponse(status_code=202, content={"job_id": job.id, "status": "queued"})
+    db.refresh(job)
+    if job.status == "failed":
+        return {"error": job.error, "job_id": job.id}
+    evaluation = db.get(InterviewEvaluation, job.evaluation_id)
+    return {"evaluation": evaluation.evaluation_text, "score": evaluation.score, "job_id": job.id}
+
+@router.post("/evaluate_candidates")
+async def evaluate_candidates(req: BulkEvaluationRequest, db: Session = Depends(get_db)):
+    """Queue re-evaluation of many candidates from their stored conversations."""
+    conversations = req.conversations or {}
+    jobs = []
+    skipped = []
+    for candidate_id in dict.fromkeys(req.candidate_ids):
+        conversation = conversations.get(candidate_id) or latest_conversation(db, candidate_id)
+        if not conversation:
+            skipped.append({"candidate_id": candidate_id, "reason": "no conversation"})
+            continue
+        jobs.append(evaluation_queue.submit(db, candidate_id, conversation).to_dict())
+    return JSONResponse(status_code=202, content={"jobs": jobs, "skipped": skipped})
+
+@router.get("/evaluation_jobs/{job_id}")
+def get_evaluation_job(job_id: str, db: Session = Depends(get_db)):
+    job = db.get(EvaluationJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Evaluation job not found")
+    result = job.to_dict()
+    if job.evaluation_id:
+        evaluation = db.get(InterviewEvaluation, job.evaluation_id)
+        result["evaluation"] = evaluation.evaluation_text
+        result["score"] = evaluation.score
+    return result
+
+@router.get("/evaluation_jobs")
+def list_evaluation_jobs(status: Optional[str] = None, limit: int = 100, db: Session = Depends(get_db)):
+    query = db.query(EvaluationJob)
+    if status:
+        query = query.filter(EvaluationJob.status == status)
+    return [job.to_dict() for job in query.order_by(EvaluationJob.created_at.desc()).limit(limit)]
 
 @router.get("/evaluations")
 def get_evaluations(db: Session = Depends(get_db)):
@@ -1,33 +1,86 @@
-from TTS.api import TTS
 from fastapi import APIRouter
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+import asyncio
 import io
+import os
+import re
+import struct
+import time
+import wave
+
+from services.metrics import metrics
+from services.tts_cache import TTSCache
+from services.model_registry import model_registry
+from services.model_hosting import TTS_MODEL as MODEL_NAME
 
 router = APIRouter()
 
-# Initialize TTS model
-tts = TTS(model_name="tts_models/en/ljspeech/tacotron2-DDC", progress_bar=False)
+# Interviews repeat the same prompts; keep their audio around
+tts_cache = TTSCache(
+    os.getenv("TTS_CACHE_DIR", "tts_cache"),
+    max_disk_bytes=int(os.getenv("TTS_CACHE_DISK_MB", "512")) * 1024 * 1024
+)
+
+# Synthesized in the background at startup so the first interview gets them instantly
+PREWARM_PROMPTS = [
+    "Hello! I'm your AI interviewer today. Could you please introduce yourself and tell me about your background?",
+    "I apologize, but I'm having trouble processing your response. Could you please repeat that?",
+    "Could you elaborate on that?",
+    "Thank you for your time today. That concludes our interview.",
+]
 
 class TTSRequest(BaseModel):
     text: str
 
+def split_sentences(text: str):
+    return [sentence for sentence in re.split(r'(?<=[.!?])\s+', text.strip()) if sentence]
+
+async def synthesize_cached(text: str, pin: bool = False) -> bytes:
+    key = TTSCache.make_key(text, MODEL_NAME)
+    if pin:
+        tts_cache.pin(key)
+    loop = asyncio.get_running_loop()
+    pcm = await loop.run_in_executor(None, tts_cache.get, key)
+    metrics.incr("tts.cache_hits" if pcm is not None else "tts.cache_misses")
+    if pcm is None:
+        # Local TTSEngine or the model server; either way off the event loop
+        tts = await model_registry.aget("tts")
+        pcm = await tts.synthesize(text)
+        await loop.run_in_executor(None, tts_cache.put, key, pcm)
+    return pcm
+
+async def output_sample_rate() -> int:
+    tts = await model_registry.aget("tts")
+    return await tts.sample_rate()
+
+def streaming_wav_header(sample_rate: int) -> bytes:
+    # Length fields are unknown up front; players treat 0xFFFFFFFF as "until EOF"
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 0xFFFFFFFF, b"WAVE",
+        b"fmt ", 16, 1, 1, sample_rate, sample_rate * 2, 2, 16,
+        b"data", 0xFFFFFFFF
+    )
+
 @router.post("/synthesize")
 async def synthesize_speech(request: TTSRequest):
+    model_registry.require("tts")
     try:
+        # Generate speech (or fetch it from the phrase cache)
+        pcm = await synthesize_cached(request.text)
+
         # Create a buffer to store the audio
         audio_buffer = io.BytesIO()
-        
-        # Generate speech
-        tts.tts_to_file(
-            text=request.text,
-            file_path=audio_buffer,
-            speaker_wav=None  # You can add a reference audio for voice cloning
-        )
-        
+        with wave.open(audio_buffer, "wb") as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(await output_sample_rate())
+            wav_file.writeframes(pcm)
+
         # Reset buffer position
         audio_buffer.seek(0)
-        
+
         # Return the audio as a streaming response
         return StreamingResponse(
             audio_buffer,
@@ -37,4 +90,83 @@ async def synthesize_speech(request: TTSRequest):
             }
         )
     except Exception as e:
-        return {"error": str(e)} 
\ No newline at end of file
+        return {"error": str(e)}
+
+@router.post("/synthesize/stream")
+async def synthesize_speech_stream(request: TTSRequest):
+    """Chunked WAV: each sentence is sent as soon as it has been synthesized."""
+    model_registry.require("tts")
+    started = time.perf_counter()
+    sample_rate = await output_sample_rate()
+    # Queue every sentence up front so the next one renders while this one is sent
+    pending = [asyncio.ensure_future(synthesize_cached(sentence)) for sentence in split_sentences(request.text)]
+
+    async def generate():
+        audio_bytes = 0
+        try:
+            yield streaming_wav_header(sample_rate)
+            for index, future in enumerate(pending):
+                pcm = await future
+                if index == 0:
+                    metrics.observe("tts.stream_ttfb", time.perf_counter() - started)
+                audio_bytes += len(pcm)
+                yield pcm
+        finally:
+            for future in pending:
+                future.cancel()
+            audio_seconds = audio_bytes / 2 / sample_rate
+            if audio_seconds:
+                # Real-time factor: wall time spent per second of audio produced
+                rtf = (time.perf_counter() - started) / audio_seconds
+                metrics.set_gauge("tts.stream_rtf", round(rtf, 3))
+                metrics.observe("tts.stream_total", time.perf_counter() - started)
+
+    return StreamingResponse(
+        generate(),
+        media_type="audio/wav",
+        headers={"X-Sentence-Count": str(len(pending))}
+    )
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    return tts_cache.stats()
+
+def load_prewarm_prompts():
+    prompts = list(PREWARM_PROMPTS)
+    path = os.getenv("TTS_PREWARM_FILE")
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            prompts += [line.strip() for line in f if line.strip()]
+    return prompts
+
+async def cache_speech(prompt: str, pin: bool = False):
+    # Whole prompts serve /synthesize; their sentences serve /synthesize/stream
+    for text in dict.fromkeys([prompt] + split_sentences(prompt)):
+        try:
+            await synthesize_cached(text, pin)
+        except Exception as e:
+            print(f"Failed to prewarm TTS cache for {text!r}: {str(e)}")
+
+# Synthesizing missing prompts at startup loads the TTS model, so it follows
+# MODEL_WARMUP unless set explicitly; otherwise only audio already on disk is loaded
+TTS_PREWARM = os.getenv("TTS_PREWARM", os.getenv("MODEL_WARMUP", "0")).lower() in ("1", "true", "yes")
+
+async def load_cached_speech(prompt: str):
+    # Disk tier only: never touches the model
+    loop = asyncio.get_running_loop()
+    for text in dict.fromkeys([prompt] + split_sentences(prompt)):
+        key = TTSCache.make_key(text, MODEL_NAME)
+        tts_cache.pin(key)
+        await loop.run_in_executor(None, tts_cache.get, key)
+
+async def prewarm_cache():
+    for prompt in load_prewarm_prompts():
+        if TTS_PREWARM:
+            await cache_speech(prompt, pin=True)
+        else:
+            await load_cached_speech(prompt)
+
+@router.on_event("startup")
+async def start_prewarm():
+    if model_registry.is_hosted("tts"):
+        asyncio.create_task(prewarm_cache())
@@ -1,30 +1,57 @@
-import whisper
-from fastapi import APIRouter, UploadFile, File
+from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi.responses import JSONResponse
 from typing import Optional
-import tempfile
 import os
 
+from services.transcription_service import TranscriptionService
+from services.transcription_cache import TranscriptionCache
+from services.model_registry import model_registry
+from services.model_hosting import WHISPER_MODEL as MODEL_NAME
+
 router = APIRouter()
-model = whisper.load_model("base")  # You can use "tiny", "base", "small", "medium", or "large"
+
+# Retried uploads of the same clip are answered from disk
+cache = TranscriptionCache(
+    os.getenv("STT_CACHE_PATH", "transcription_cache.db"),
+    max_bytes=int(os.getenv("STT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+)
+# Uploads are queued and transcribed off the event loop
+transcription_service = TranscriptionService(
+    lambda: model_registry.aget("whisper"),
+    workers=int(os.getenv("STT_WORKERS", "2")),
+    cache=cache,
+    model_name=f"whisper-{MODEL_NAME}",
+    options={"without_timestamps": False}
+)
 
 @router.post("/transcribe")
-async def transcribe_audio(audio_file: UploadFile = File(...)):
+async def transcribe_audio(audio_file: UploadFile = File(...), async_mode: bool = False):
+    model_registry.require("whisper")
     try:
-        # Save the uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_file:
-            content = await audio_file.read()
-            temp_file.write(content)
-            temp_file_path = temp_file.name
-
-        # Transcribe the audio
-        result = model.transcribe(temp_file_path)
-        
-        # Clean up the temporary file
-        os.unlink(temp_file_path)
-        
+        content = await audio_file.read()
+        job = await transcription_service.submit(content, audio_file.filename)
+
+        # Long recordings: hand back a job id and let the client poll
+        if async_mode:
+            return JSONResponse(status_code=202, content={"job_id": job.id, "status": job.status})
+
+        await job.done.wait()
+        if job.status == "failed":
+            return {"error": job.error}
         return {
-            "text": result["text"],
-            "segments": result["segments"]
+            "text": job.result["text"],
+            "segments": job.result["segments"]
         }
     except Exception as e:
-        return {"error": str(e)} 
\ No newline at end of file
+        return {"error": str(e)}
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    return cache.stats()
+
+@router.get("/jobs/{job_id}")
+async def get_transcription_job(job_id: str):
+    job = transcription_service.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Transcription job not found")
+    return job.to_dict()
@@ -0,0 +1,74 @@
+"""Relays room broadcasts and presence between backend workers.
+
+Run `python backplane_broker.py` and start every worker with the same
+BACKPLANE_ADDRESS. Each frame a worker publishes is forwarded to all other
+workers; when a worker goes away the others are told so they can drop its
+members from room presence.
+"""
+import asyncio
+import logging
+import os
+from typing import Dict
+
+from services.model_ipc import parse_address, read_frame, write_frame
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+ADDRESS = os.getenv("BACKPLANE_ADDRESS", "/tmp/autointerviewer-backplane.sock")
+
+# node id -> writer of every connected worker
+peers: Dict[str, asyncio.StreamWriter] = {}
+
+def relay(header: dict, exclude: str = None):
+    for node, writer in list(peers.items()):
+        if node == exclude:
+            continue
+        try:
+            write_frame(writer, header)
+        except Exception as e:
+            logger.warning(f"Dropping peer {node}: {str(e)}")
+            peers.pop(node, None)
+            writer.close()
+
+async def handle_peer(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    node = None
+    try:
+        hello, _ = await read_frame(reader)
+        node = hello.get("node")
+        if hello.get("op") != "hello" or not node:
+            return
+        peers[node] = writer
+        logger.info(f"Worker {node} connected ({len(peers)} total)")
+        while True:
+            header, _ = await read_frame(reader)
+            relay(header, exclude=node)
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        if node and peers.get(node) is writer:
+            del peers[node]
+            logger.info(f"Worker {node} disconnected ({len(peers)} total)")
+            relay({"op": "peer_down", "node": node})
+        writer.close()
+
+async def main():
+    target = parse_address(ADDRESS)
+    if isinstance(target, tuple):
+        server = await asyncio.start_server(handle_peer, *target)
+    else:
+        if os.path.exists(target):
+            os.remove(target)  # stale socket from a previous run
+        server = await asyncio.start_unix_server(handle_peer, target)
+    logger.info(f"Backplane broker listening on {ADDRESS}")
+    async with server:
+        await server.serve_forever()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        logger.info("Broker stopped by user")
@@ -0,0 +1,61 @@
+"""LiveKit token issuance: PyJWT per request vs. the cached token service.
+
+Reports tokens per second for a fresh PyJWT encode (what get-token used to
+do), the service's precomputed-HMAC signing on cache misses, and reissuing
+to identities that already hold a valid token (reconnects). Usage, from
+backend/:
+
+    python benchmarks/livekit_token_benchmark.py [--tokens 20000] [--identities 500]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jwt
+
+from services.livekit_tokens import LiveKitTokenService
+
+API_KEY = "devkey"
+API_SECRET = "secret"
+
+def pyjwt_token(room_name: str, identity: str) -> str:
+    now = int(time.time())
+    return jwt.encode({
+        "iss": API_KEY,
+        "sub": identity,
+        "exp": now + 3600,
+        "nbf": now,
+        "name": identity,
+        "video": {"room": room_name, "roomJoin": True}
+    }, API_SECRET, algorithm="HS256")
+
+def measure(label: str, issue, count: int, identities: int):
+    started = time.perf_counter()
+    for i in range(count):
+        issue(f"room-{i % 50}", f"user-{i % identities}")
+    elapsed = time.perf_counter() - started
+    print(f"{label:<16} {count} tokens: {count / elapsed:>10,.0f} tokens/s")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=20000)
+    parser.add_argument("--identities", type=int, default=500)
+    args = parser.parse_args()
+
+    service = LiveKitTokenService(API_KEY, API_SECRET)
+    token = service.issue("room-0", "user-0")["token"]
+    claims = jwt.decode(token, API_SECRET, algorithms=["HS256"])
+    assert claims["video"] == {"room": "room-0", "roomJoin": True}, claims
+
+    measure("pyjwt", pyjwt_token, args.tokens, args.identities)
+    # Fresh service with a distinct identity per token: every issue is a signing miss
+    signing = LiveKitTokenService(API_KEY, API_SECRET, max_entries=args.tokens)
+    measure("service (miss)", signing.issue, args.tokens, args.tokens)
+    measure("service (cached)", service.issue, args.tokens, args.identities)
+    print(f"cache: {service.stats()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Chat fan-out throughput: the original handler vs. the shared session layer.
+
+Runs both in-process against fake websockets (no network), one core, and
+reports incoming chat messages processed per second of CPU time. Usage,
+from backend/:
+
+    python benchmarks/ws_chat_benchmark.py [--rooms 50] [--members 4] [--messages 200]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from typing import Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import WebSocketDisconnect
+
+from services.connection_registry import ConnectionRegistry
+from services.ws_codec import CODECS
+from services.ws_session import run_chat_session
+
+class FakeWebSocket:
+    """Sends `outgoing` chat messages, then disconnects; counts what it receives."""
+
+    def __init__(self, outgoing, binary: bool = False):
+        self.outgoing = list(outgoing)
+        self.binary = binary
+        self.received = 0
+        self.done = asyncio.Event()
+
+    async def accept(self):
+        pass
+
+    async def close(self, code: int = 1000, reason: str = None):
+        pass
+
+    async def receive(self):
+        if self.outgoing:
+            await asyncio.sleep(0)
+            data = self.outgoing.pop(0)
+            return {"type": "websocket.receive", "bytes": data} if self.binary else {"type": "websocket.receive", "text": data}
+        await self.done.wait()
+        return {"type": "websocket.disconnect", "code": 1000}
+
+    async def receive_text(self):
+        if self.outgoing:
+            await asyncio.sleep(0)
+            return self.outgoing.pop(0)
+        await self.done.wait()
+        raise WebSocketDisconnect()
+
+    async def send_text(self, text):
+        self.received += 1
+
+    async def send_bytes(self, data):
+        self.received += 1
+
+# --- The original ConnectionManager and /ws/chat message loop, for comparison ---
+
+class LegacyConnectionManager:
+    def __init__(self):
+        self.active_connections: Dict[str, FakeWebSocket] = {}
+
+    async def broadcast_to_room(self, room_name: str, message: str, sender: str, exclude: str = None):
+        for conn_id, conn in self.active_connections.items():
+            if conn_id.startswith(f"{room_name}:") and conn_id != exclude:
+                try:
+                    await conn.send_text(json.dumps({
+                        "type": "message",
+                        "message": message,
+                        "sender": sender
+                    }))
+                except:
+                    pass
+
+async def legacy_session(websocket, manager, room_name, identity):
+    connection_id = f"{room_name}:{identity}"
+    manager.active_connections[connection_id] = websocket
+    await websocket.send_text(json.dumps({"type": "system", "message": f"Welcome to room {room_name}!", "sender": "system"}))
+    while True:
+        try:
+            data = await websocket.receive_text()
+            print(f"Received message from {connection_id}: {data}")
+            try:
+                message_data = json.loads(data)
+                if isinstance(message_data, str):
+                    message_data = {"message": message_data}
+                if message_data.get("type") == "ping":
+                    await websocket.send_text(json.dumps({"type": "pong", "message": "pong", "sender": "system"}))
+                    continue
+                await manager.broadcast_to_room(room_name, message_data.get("message", data), identity, connection_id)
+            except json.JSONDecodeError:
+                await manager.broadcast_to_room(room_name, data, identity, connection_id)
+        except WebSocketDisconnect:
+            break
+    del manager.active_connections[connection_id]
+
+# --------------------------------------------------------------------------------
+
+async def run(mode: str, rooms: int, members: int, messages: int) -> float:
+    binary = mode == "msgpack"
+    codec = CODECS["msgpack" if binary else "json"]
+    payload = codec.encode({"message": "Could you tell me more about that project?"})
+    sockets = []
+    for room in range(rooms):
+        for member in range(members):
+            sockets.append((f"room{room}", f"user{member}", FakeWebSocket([payload] * messages if member == 0 else [], binary)))
+
+    expected = messages  # per listener
+    if mode == "legacy":
+        manager = LegacyConnectionManager()
+        session = lambda ws, room, identity: legacy_session(ws, manager, room, identity)
+    else:
+        registry = ConnectionRegistry("bench", max_pending=messages + 8)
+        session = lambda ws, room, identity: run_chat_session(ws, registry, room, identity, codec.name)
+
+    start_cpu = time.process_time()
+    start_wall = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        tasks = [asyncio.create_task(session(ws, room, identity)) for room, identity, ws in sockets]
+        # Done once every listener got every message (plus its welcome)
+        while any(ws.received < expected + 1 for _, identity, ws in sockets if identity != "user0"):
+            await asyncio.sleep(0.001)
+    elapsed_cpu = time.process_time() - start_cpu
+    elapsed_wall = time.perf_counter() - start_wall
+    for _, _, ws in sockets:
+        ws.done.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    total = rooms * messages
+    print(f"{mode:8s} {total} messages -> {total * (members - 1)} deliveries: "
+          f"{total / elapsed_cpu:,.0f} msg/s per core (cpu {elapsed_cpu:.2f}s, wall {elapsed_wall:.2f}s)")
+    return total / elapsed_cpu
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rooms", type=int, default=50)
+    parser.add_argument("--members", type=int, default=4)
+    parser.add_argument("--messages", type=int, default=200)
+    args = parser.parse_args()
+    modes = ["legacy", "json"] + (["msgpack"] if "msgpack" in CODECS else [])
+    for mode in modes:
+        asyncio.run(run(mode, args.rooms, args.members, args.messages))
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,29 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from pydantic import BaseModel
-from typing import Optional, List, Dict
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict, Literal
 import uvicorn
 from models.candidate import Base
 from api import whisper_api, tts_api, llm_api, resume_api, candidates_api, livekit_api
 from db import engine, SessionLocal, get_db
+from services.audio_decoder import StreamingDecoder
+from services.audio_pipeline import FrameQueue, END_OF_SPEECH
+from services.metrics import metrics
+from services.vad import VoiceActivityDetector
+from services.vosk_pool import vosk_pool
+from services.model_registry import model_registry, ModelNotHostedError
+from services.connection_registry import ConnectionRegistry
+from services.ws_session import run_chat_session
+from services.backplane import backplane
+from services.room_state import room_state
+from fastapi.responses import JSONResponse
+import os
 from fastapi import WebSocket, WebSocketDisconnect
 import json
 import asyncio
-import websockets
-import subprocess
-import numpy as np
 import time
+from collections import deque
 
 # Create tables
 Base.metadata.create_all(bind=engine)
@@ -38,165 +48,64 @@ app.add_middleware(
 )
 
 # WebSocket connection manager
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}
-        self.connection_locks: Dict[str, asyncio.Lock] = {}
+# Chat connections by room; broadcasts fan out concurrently through per-connection queues
+manager = ConnectionRegistry("chat", backplane, room_state=room_state)
 
-    async def connect(self, websocket: WebSocket, room_name: str, identity: str) -> str:
-        connection_id = f"{room_name}:{identity}"
-        if connection_id not in self.connection_locks:
-            self.connection_locks[connection_id] = asyncio.Lock()
-        
-        async with self.connection_locks[connection_id]:
-            if connection_id in self.active_connections:
-                try:
-                    await self.active_connections[connection_id].close()
-                except:
-                    pass
-            self.active_connections[connection_id] = websocket
-            return connection_id
+# Add WebSocket endpoint for chat; ?format=msgpack for binary frames
+@app.websocket("/ws/chat/{room_name}/{identity}")
+async def chat_websocket(websocket: WebSocket, room_name: str, identity: str, format: str = "json"):
+    await run_chat_session(websocket, manager, room_name, identity, format)
 
-    def disconnect(self, connection_id: str):
-        if connection_id in self.active_connections:
-            del self.active_connections[connection_id]
-        if connection_id in self.connection_locks:
-            del self.connection_locks[connection_id]
+@app.get("/api/chat/rooms/{room_name}/members")
+async def get_chat_room_members(room_name: str):
+    # Members on every worker sharing the backplane
+    return {"room": room_name, "members": manager.members(room_name)}
 
-    async def broadcast_to_room(self, room_name: str, message: str, sender: str, exclude: str = None):
-        for conn_id, conn in self.active_connections.items():
-            if conn_id.startswith(f"{room_name}:") and conn_id != exclude:
-                try:
-                    await conn.send_text(json.dumps({
-                        "type": "message",
-                        "message": message,
-                        "sender": sender
-                    }))
-                except:
-                    pass
+# Per-room audio streaming settings
+SAMPLE_RATE = 16000
+BYTES_PER_SAMPLE = 2
 
-manager = ConnectionManager()
+class AudioStreamSettings(BaseModel):
+    frame_ms: int = Field(200, ge=20, le=5000)  # PCM forwarded to Vosk per frame
+    queue_frames: int = Field(25, ge=1, le=500)  # frames buffered while Vosk catches up
+    overflow_policy: Literal["block", "drop_oldest", "coalesce"] = "drop_oldest"
 
-# Add WebSocket endpoint for chat
-@app.websocket("/ws/chat/{room_name}/{identity}")
-async def chat_websocket(websocket: WebSocket, room_name: str, identity: str):
-    connection_id = None
-    try:
-        print(f"Attempting chat WebSocket connection for room: {room_name}, identity: {identity}")
-        
-        # Accept the connection
-        await websocket.accept()
-        connection_id = await manager.connect(websocket, room_name, identity)
-        print(f"Chat WebSocket connection accepted: {connection_id}")
-        
-        # Send welcome message
-        await websocket.send_text(json.dumps({
-            "type": "system",
-            "message": f"Welcome to room {room_name}!",
-            "sender": "system"
-        }))
-        
-        # Main message loop
-        while True:
-            try:
-                data = await websocket.receive_text()
-                print(f"Received message from {connection_id}: {data}")
-                
-                try:
-                    message_data = json.loads(data)
-                    if isinstance(message_data, str):
-                        message_data = {"message": message_data}
-                    
-                    # Handle init message
-                    if message_data.get("type") == "init":
-                        print(f"Received init message from {connection_id}")
-                        await websocket.send_text(json.dumps({
-                            "type": "system",
-                            "message": "Connection initialized successfully",
-                            "sender": "system"
-                        }))
-                        # Keep the connection alive
-                        continue
-                    
-                    # Handle ping message
-                    if message_data.get("type") == "ping":
-                        print(f"Received ping from {connection_id}")
-                        await websocket.send_text(json.dumps({
-                            "type": "pong",
-                            "message": "pong",
-                            "sender": "system"
-                        }))
-                        continue
-                    
-                    # Handle regular messages
-                    broadcast_message = message_data.get("message", data)
-                    await manager.broadcast_to_room(
-                        room_name,
-                        broadcast_message,
-                        identity,
-                        connection_id
-                    )
-                except json.JSONDecodeError:
-                    # Handle non-JSON messages
-                    await manager.broadcast_to_room(
-                        room_name,
-                        data,
-                        identity,
-                        connection_id
-                    )
-            except WebSocketDisconnect:
-                print(f"WebSocket disconnected: {connection_id}")
-                break
-            except Exception as e:
-                print(f"Error processing message: {str(e)}")
-                try:
-                    await websocket.send_text(json.dumps({
-                        "type": "error",
-                        "message": f"Error processing message: {str(e)}",
-                        "sender": "system"
-                    }))
-                except:
-                    break
-    except WebSocketDisconnect:
-        print(f"Client disconnected: {connection_id}")
-    except Exception as e:
-        print(f"WebSocket error: {str(e)}")
-    finally:
-        if connection_id:
-            print(f"Cleaning up connection: {connection_id}")
-            manager.disconnect(connection_id)
-            try:
-                await manager.broadcast_to_room(
-                    room_name,
-                    f"{identity} has left the room",
-                    "system",
-                    connection_id
-                )
-            except Exception as e:
-                print(f"Error broadcasting disconnect message: {str(e)}")
+room_audio_settings: Dict[str, AudioStreamSettings] = {}
+# Recognizer queue of every live audio stream, by connection id
+active_audio_streams: Dict[str, FrameQueue] = {}
 
-def convert_to_pcm(input_bytes):
-    process = subprocess.Popen(
-        [
-            'ffmpeg', '-i', 'pipe:0', '-f', 's16le', '-acodec', 'pcm_s16le', '-ar', '16000', '-ac', '1', 'pipe:1'
-        ],
-        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
-    )
-    out, err = process.communicate(input=input_bytes)
-    return out
+@app.get("/api/audio/rooms/{room_name}/settings", response_model=AudioStreamSettings)
+async def get_room_audio_settings(room_name: str):
+    return room_audio_settings.get(room_name, AudioStreamSettings())
 
-def is_silence(pcm_data, threshold=100):
-    arr = np.frombuffer(pcm_data, dtype=np.int16)
-    return np.abs(arr).sum() < threshold
+@app.put("/api/audio/rooms/{room_name}/settings", response_model=AudioStreamSettings)
+async def update_room_audio_settings(room_name: str, settings: AudioStreamSettings):
+    room_audio_settings[room_name] = settings
+    return settings
+
+@app.get("/api/audio/streams")
+async def list_audio_streams():
+    return {conn_id: frames.stats() for conn_id, frames in active_audio_streams.items()}
+
+@app.get("/api/audio/recognizers")
+async def list_recognizer_connections():
+    return vosk_pool.stats()
 
 @app.websocket("/ws/audio_stream/{room_name}/{identity}")
-async def audio_stream(websocket: WebSocket, room_name: str, identity: str):
+async def audio_stream(websocket: WebSocket, room_name: str, identity: str, frame_ms: Optional[int] = None):
     connection_id = f"{room_name}:{identity}"
-    vosk_ws = None
+    vosk_session = None
+    decoder = None
+    frames = None
     try:
         await websocket.accept()
         print(f"Audio WebSocket connection accepted: {connection_id}")
         
+        # Room settings, optionally overridden per connection with ?frame_ms=
+        settings = room_audio_settings.get(room_name, AudioStreamSettings())
+        if frame_ms is not None:
+            settings = AudioStreamSettings(**{**settings.model_dump(), "frame_ms": frame_ms})
+        
         # Send initial connection success message
         await websocket.send_text(json.dumps({
             "type": "system",
@@ -204,24 +113,28 @@ async def audio_stream(websocket: WebSocket, room_name: str, identity: str):
             "sender": "system"
         }))
         
-        # Connect to Vosk WebSocket server with retry logic
-        max_retries = 3
-        retry_delay = 1  # seconds
+        # Recognizer session on a warm, shared connection to the Vosk servers
+        vosk_session = await vosk_pool.open_session()
         
-        for attempt in range(max_retries):
-            try:
-                vosk_ws = await websockets.connect("ws://localhost:2700")
-                print(f"Connected to Vosk server on attempt {attempt + 1}")
-                break
-            except Exception as e:
-                if attempt == max_retries - 1:
-                    raise Exception(f"Failed to connect to Vosk server after {max_retries} attempts: {str(e)}")
-                print(f"Failed to connect to Vosk server (attempt {attempt + 1}): {str(e)}")
-                await asyncio.sleep(retry_delay)
+        # One long-lived decoder per connection; compressed audio goes in as it
+        # arrives and PCM comes out continuously
+        decoder = StreamingDecoder()
+        decoder.start()
         
+        # Bounded hand-off between decoding and recognition so a slow recognizer
+        # cannot make memory per interview grow without limit
+        frame_size = SAMPLE_RATE * BYTES_PER_SAMPLE * settings.frame_ms // 1000
+        frame_size -= frame_size % BYTES_PER_SAMPLE
+        frames = FrameQueue(settings.queue_frames, frame_size, settings.overflow_policy)
+        active_audio_streams[connection_id] = frames
+
+        # Receive time of the newest compressed chunk, and receive times of
+        # frames sent to Vosk that have not been answered with a transcript yet
+        last_received_at = time.monotonic()
+        pending_frames = deque()
+
         async def forward_audio():
-            audio_buffer = bytearray()
-            CHUNK_SIZE = 16000 * 2 * 5  # 5 seconds of 16kHz 16-bit mono audio
+            nonlocal last_received_at
             last_activity = time.time()
             
             while True:
@@ -229,13 +142,8 @@ async def audio_stream(websocket: WebSocket, room_name: str, identity: str):
                     # Set a timeout for receiving data
                     data = await asyncio.wait_for(websocket.receive_bytes(), timeout=10.0)
                     last_activity = time.time()
-                    audio_buffer.extend(data)
-                    
-                    if len(audio_buffer) >= CHUNK_SIZE:
-                        pcm_data = convert_to_pcm(audio_buffer)
-                        if not is_silence(pcm_data):
-                            await vosk_ws.send(pcm_data)
-                        audio_buffer = bytearray()
+                    last_received_at = time.monotonic()
+                    await decoder.feed(data)
                 except asyncio.TimeoutError:
                     # Check if we've been inactive for too long
                     if time.time() - last_activity > 30:  # 30 seconds timeout
@@ -245,17 +153,78 @@ async def audio_stream(websocket: WebSocket, room_name: str, identity: str):
                 except Exception as e:
                     print(f"Error in forward_audio: {str(e)}")
                     break
+            decoder.end_input()
+        
+        async def forward_pcm():
+            vad = VoiceActivityDetector(sample_rate=SAMPLE_RATE)
+            pcm_buffer = bytearray()
+            overloaded = False
+            
+            while True:
+                pcm = await decoder.read()
+                if not pcm:
+                    break
+                pcm_buffer.extend(pcm)
+                
+                # Forward as soon as a full frame is available instead of waiting for seconds of audio
+                while len(pcm_buffer) >= frame_size:
+                    pcm_data = bytes(pcm_buffer[:frame_size])
+                    del pcm_buffer[:frame_size]
+                    # Only speech goes to the recognizer; long pauses cost nothing
+                    pieces = vad.process(pcm_data)
+                    metrics.incr("audio.vad_dropped_bytes", len(pcm_data) - sum(len(speech) for speech, _ in pieces))
+                    for speech, speech_ended in pieces:
+                        if speech:
+                            await frames.put(speech, last_received_at)
+                        if speech_ended:
+                            # Silence is never forwarded, so tell Vosk the utterance is over
+                            await frames.put(END_OF_SPEECH, last_received_at)
+                
+                # Let the client know when the recognizer can't keep up, and when it recovers
+                if frames.full != overloaded:
+                    overloaded = frames.full
+                    metrics.incr("audio.overloaded" if overloaded else "audio.recovered")
+                    await websocket.send_text(json.dumps({
+                        "type": "overloaded" if overloaded else "recovered",
+                        "message": "Recognizer overloaded" if overloaded else "Recognizer caught up",
+                        "queue_depth": frames.depth,
+                        "sender": "system"
+                    }))
+            await frames.close()
+        
+        async def send_frames():
+            while True:
+                item = await frames.get()
+                if item is None:
+                    break
+                pcm, received_at = item
+                if pcm is END_OF_SPEECH:
+                    await vosk_session.end_of_speech()
+                else:
+                    pending_frames.append(received_at)
+                    await vosk_session.send_audio(bytes(pcm))
         
         async def receive_transcript():
             try:
-                async for message in vosk_ws:
+                async for message in vosk_session:
                     if websocket.client_state.CONNECTED:
                         await websocket.send_text(message)
+                        transcript = json.loads(message)
+                        # Latency from audio received to transcript delivered to the client
+                        if pending_frames and transcript.get("type") in ("partial", "final"):
+                            metrics.observe(f"audio.{transcript['type']}_latency", time.monotonic() - pending_frames[0])
+                            pending_frames.clear()
+                        # Lets the LLM start on the next question before the answer is over
+                        llm_api.speculator.on_transcript(room_name, transcript)
             except Exception as e:
                 print(f"Error in receive_transcript: {str(e)}")
         
-        # Run both tasks concurrently
-        await asyncio.gather(forward_audio(), receive_transcript())
+        # Run all stages concurrently; transcripts stop once the audio side is done
+        transcript_task = asyncio.create_task(receive_transcript())
+        try:
+            await asyncio.gather(forward_audio(), forward_pcm(), send_frames())
+        finally:
+            transcript_task.cancel()
         
     except WebSocketDisconnect:
         print(f"Client disconnected: {connection_id}")
@@ -270,13 +239,47 @@ async def audio_stream(websocket: WebSocket, room_name: str, identity: str):
         except:
             pass
     finally:
-        if vosk_ws:
-            await vosk_ws.close()
+        active_audio_streams.pop(connection_id, None)
+        if frames:
+            await frames.close()
+        if decoder:
+            await decoder.close()
+        if vosk_session:
+            await vosk_session.close()
         try:
             await websocket.close()
         except:
             pass
 
+@app.on_event("startup")
+async def start_backplane():
+    await backplane.start()
+
+@app.on_event("startup")
+async def warm_up_recognizer_pool():
+    # Open the Vosk connections now so the first interview doesn't pay for it
+    await vosk_pool.start()
+
+# Models load lazily on first use; MODEL_WARMUP=1 loads them in the background instead
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "0").lower() in ("1", "true", "yes")
+
+@app.on_event("startup")
+async def warm_up_models():
+    if MODEL_WARMUP:
+        asyncio.create_task(model_registry.warm_up())
+
+# Speculative questions also get their audio synthesized ahead of time
+SPECULATIVE_TTS = os.getenv("SPECULATIVE_TTS", "0").lower() in ("1", "true", "yes")
+
+@app.on_event("startup")
+async def enable_speculative_tts():
+    if SPECULATIVE_TTS and model_registry.is_hosted("tts"):
+        llm_api.speculator.on_ready = lambda result: tts_api.cache_speech(result[0].question)
+
+@app.exception_handler(ModelNotHostedError)
+async def model_not_hosted_handler(request, exc: ModelNotHostedError):
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
+
 # Include routers
 app.include_router(whisper_api.router, prefix="/api/stt", tags=["Speech-to-Text"])
 app.include_router(tts_api.router, prefix="/api/tts", tags=["Text-to-Speech"])
@@ -290,5 +293,24 @@ app.include_router(livekit_api.router, prefix="/api/livekit", tags=["LiveKit"])
 async def health_check():
     return {"status": "healthy", "version": "1.0.0"}
 
+# Readiness: with warm-up, 200 once every hosted model has loaded; lazy
+# workers are ready straight away unless a model failed to load
+@app.get("/ready")
+async def readiness_check():
+    models = model_registry.status()
+    ok_states = ("ready", "not_hosted") if MODEL_WARMUP else ("ready", "not_hosted", "not_loaded", "loading")
+    ready = all(model["state"] in ok_states for model in models.values())
+    return JSONResponse(status_code=200 if ready else 503, content={"ready": ready, "models": models})
+
+# Runtime metrics (latencies, counters, queue depths)
+@app.get("/metrics")
+async def get_metrics():
+    return metrics.snapshot()
+
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
+    # Keepalive is websocket protocol ping/pong, not app-level messages
+    uvicorn.run(
+        "main:app", host="0.0.0.0", port=8000, reload=True,
+        ws_ping_interval=float(os.getenv("WS_PING_INTERVAL", "20")),
+        ws_ping_timeout=float(os.getenv("WS_PING_TIMEOUT", "20"))
+    ) 
\ No newline at end of file
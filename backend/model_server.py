@@ -0,0 +1,103 @@
+"""Hosts Whisper and TTS once for every API worker on this machine.
+
+Run `python model_server.py`, then start the API with the same
+MODEL_SERVER_ADDRESS and as many uvicorn workers as needed; workers forward
+inference here instead of each loading their own copy of the weights.
+Requests from all workers meet in one WhisperBatcher, so they batch together.
+"""
+import asyncio
+import logging
+import os
+
+import numpy as np
+
+from services.model_hosting import register_models
+from services.model_ipc import parse_address, read_frame, write_frame
+from services.model_registry import ModelRegistry, _hosted_from_env
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+ADDRESS = os.getenv("MODEL_SERVER_ADDRESS", "/tmp/autointerviewer-models.sock")
+
+# This process always loads models itself, whatever the API workers are told
+registry = ModelRegistry(_hosted_from_env())
+register_models(registry, server_address=None)
+
+async def transcribe(header: dict, payload: bytes):
+    batcher = await registry.aget("whisper")
+    result = await batcher.transcribe(np.frombuffer(payload, dtype=np.float32))
+    return {"result": result}, b""
+
+async def synthesize(header: dict, payload: bytes):
+    tts = await registry.aget("tts")
+    pcm = await tts.synthesize(header["text"])
+    return {"sample_rate": await tts.sample_rate()}, pcm
+
+async def tts_info(header: dict, payload: bytes):
+    tts = await registry.aget("tts")
+    return {"sample_rate": await tts.sample_rate()}, b""
+
+async def status(header: dict, payload: bytes):
+    return {"models": registry.status()}, b""
+
+HANDLERS = {
+    "transcribe": transcribe,
+    "synthesize": synthesize,
+    "tts_info": tts_info,
+    "status": status,
+}
+
+async def handle_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """One connection per API worker; its requests are served concurrently."""
+    write_lock = asyncio.Lock()
+    tasks = set()
+
+    async def serve(header: dict, payload: bytes):
+        handler = HANDLERS.get(header.get("op"))
+        try:
+            if handler is None:
+                raise ValueError(f"Unknown operation {header.get('op')!r}")
+            response, body = await handler(header, payload)
+        except Exception as e:
+            logger.error(f"{header.get('op')} failed: {str(e)}")
+            response, body = {"error": str(e)}, b""
+        response["id"] = header.get("id")
+        async with write_lock:
+            write_frame(writer, response, body)
+            await writer.drain()
+
+    try:
+        while True:
+            header, payload = await read_frame(reader)
+            task = asyncio.create_task(serve(header, payload))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        for task in tasks:
+            task.cancel()
+        writer.close()
+
+async def main():
+    target = parse_address(ADDRESS)
+    if isinstance(target, tuple):
+        server = await asyncio.start_server(handle_connection, *target)
+    else:
+        if os.path.exists(target):
+            os.remove(target)  # stale socket from a previous run
+        server = await asyncio.start_unix_server(handle_connection, target)
+    logger.info(f"Model server listening on {ADDRESS}")
+    asyncio.create_task(registry.warm_up())
+    async with server:
+        await server.serve_forever()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        logger.info("Server stopped by user")
@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON
+from datetime import datetime
+from .candidate import Base
+
+class EvaluationJob(Base):
+    __tablename__ = "evaluation_jobs"
+    id = Column(String, primary_key=True, index=True)  # uuid hex
+    candidate_id = Column(Integer, ForeignKey("candidates.id"), index=True)
+    conversation = Column(JSON)
+    status = Column(String, default="queued", index=True)  # "queued", "running", "completed", "failed"
+    attempts = Column(Integer, default=0)
+    error = Column(String, nullable=True)
+    evaluation_id = Column(Integer, ForeignKey("interview_evaluations.id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "candidate_id": self.candidate_id,
+            "status": self.status,
+            "attempts": self.attempts,
+            "error": self.error,
+            "evaluation_id": self.evaluation_id,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
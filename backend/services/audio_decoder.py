@@ -0,0 +1,159 @@
+import asyncio
+import concurrent.futures
+import queue
+import subprocess
+import threading
+from typing import Optional
+
+import numpy as np
+
+# Decode whatever container the browser sends (WebM/Opus or OGG/Opus) into
+# 16 kHz 16-bit mono PCM, which is what Vosk expects.
+FFMPEG_CMD = [
+    'ffmpeg', '-loglevel', 'quiet',
+    '-fflags', 'nobuffer', '-i', 'pipe:0',
+    '-f', 's16le', '-acodec', 'pcm_s16le', '-ar', '16000', '-ac', '1',
+    '-flush_packets', '1', 'pipe:1'
+]
+
+class StreamingDecoder:
+    """One ffmpeg process per audio stream, fed incrementally.
+
+    The process is started once per connection and kept alive for its whole
+    lifetime, so we only pay the fork/exec cost once. Writing to ffmpeg's stdin
+    and reading its stdout happen on two daemon threads, which keeps the event
+    loop free and works with both the selector and proactor loops on Windows.
+
+    Both sides are bounded: if nobody reads PCM, ffmpeg's stdout fills, it
+    stops consuming stdin, and feed() starts waiting instead of buffering.
+    """
+
+    def __init__(self, sample_rate: int = 16000, read_size: int = 4096, max_pending: int = 64):
+        self.sample_rate = sample_rate
+        self.read_size = read_size
+        self.max_pending = max_pending
+        self.process: Optional[subprocess.Popen] = None
+        self._input: "queue.Queue[Optional[bytes]]" = queue.Queue(maxsize=max_pending)
+        self._output: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._threads = []
+        self._closed = False
+        self._stopped = False
+        self._shutdown = False
+
+    def start(self):
+        cmd = list(FFMPEG_CMD)
+        cmd[cmd.index('-ar') + 1] = str(self.sample_rate)
+        self._loop = asyncio.get_running_loop()
+        self._output = asyncio.Queue(maxsize=self.max_pending)
+        self.process = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            bufsize=0
+        )
+        self._threads = [
+            threading.Thread(target=self._write_loop, daemon=True),
+            threading.Thread(target=self._read_loop, daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    @property
+    def pending_input(self) -> int:
+        return self._input.qsize()
+
+    async def feed(self, data: bytes):
+        """Queue compressed bytes for decoding, waiting while the decoder is backed up."""
+        data = bytes(data)
+        while not self._closed and not self._stopped:
+            try:
+                self._input.put_nowait(data)
+                return
+            except queue.Full:
+                await asyncio.sleep(0.01)
+
+    def end_input(self):
+        """Signal end of stream; ffmpeg flushes what it has and exits."""
+        if not self._closed:
+            self._closed = True
+            # Sentinel for the writer thread; it may have to wait for room
+            threading.Thread(target=self._input.put, args=(None,), daemon=True).start()
+
+    async def read(self) -> bytes:
+        """Return the next block of decoded PCM, or b"" once ffmpeg has exited."""
+        return await self._output.get()
+
+    async def close(self):
+        self.end_input()
+        self._stopped = True
+        self._shutdown = True
+        if self.process is None:
+            return
+        if self.process.poll() is None:
+            self.process.kill()
+        await asyncio.get_running_loop().run_in_executor(None, self.process.wait)
+
+    def _write_loop(self):
+        stdin = self.process.stdin
+        try:
+            while True:
+                chunk = self._input.get()
+                if chunk is None:
+                    break
+                stdin.write(chunk)
+        except (BrokenPipeError, OSError, ValueError):
+            # ffmpeg went away; stop accepting input
+            self._stopped = True
+        finally:
+            try:
+                stdin.close()
+            except Exception:
+                pass
+
+    def _read_loop(self):
+        stdout = self.process.stdout
+        try:
+            while True:
+                pcm = stdout.read(self.read_size)
+                if not pcm:
+                    break
+                self._publish(pcm)
+        except (OSError, ValueError):
+            pass
+        finally:
+            self._publish(b"")
+
+    def _publish(self, pcm: bytes):
+        # Blocks this thread (not the loop) while the PCM queue is full
+        try:
+            future = asyncio.run_coroutine_threadsafe(self._output.put(pcm), self._loop)
+        except RuntimeError:
+            # Event loop already closed; nobody is listening any more
+            return
+        while True:
+            try:
+                future.result(timeout=0.5)
+                return
+            except concurrent.futures.TimeoutError:
+                if self._shutdown:
+                    future.cancel()
+                    return
+
+def decode_audio_bytes(data: bytes, sample_rate: int = 16000) -> np.ndarray:
+    """Decode a complete audio file held in memory to float32 mono samples.
+
+    Blocking; call it from a worker thread. Any container ffmpeg understands
+    works, and nothing is written to disk.
+    """
+    cmd = list(FFMPEG_CMD)
+    cmd[cmd.index('-ar') + 1] = str(sample_rate)
+    # Unlike the streaming decoder, report why a file can't be decoded
+    cmd[cmd.index('-loglevel') + 1] = 'error'
+    result = subprocess.run(cmd, input=data, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        reason = result.stderr.decode(errors='ignore').strip() or f"ffmpeg exited with code {result.returncode}"
+        raise RuntimeError(f"Failed to decode audio: {reason}")
+    pcm = result.stdout[:len(result.stdout) - len(result.stdout) % 2]
+    return np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
@@ -0,0 +1,114 @@
+import asyncio
+from collections import deque
+from typing import Optional, Tuple
+
+# Queued after audio when the VAD sees the end of an utterance
+END_OF_SPEECH = object()
+
+OVERFLOW_POLICIES = ("block", "drop_oldest", "coalesce")
+
+class FrameQueue:
+    """Bounded queue of PCM frames between the decoder/VAD stage and the recognizer.
+
+    When the recognizer falls behind and the queue is full, the overflow policy
+    decides what happens to new audio:
+
+    - block: the producer waits, which stops reading from the client socket
+    - drop_oldest: the oldest queued frame is discarded
+    - coalesce: queued frames are merged into fewer, larger sends and the
+      oldest audio beyond the byte budget is trimmed
+
+    End-of-speech markers are never dropped, so utterances still get finalized.
+    """
+
+    def __init__(self, max_frames: int, frame_bytes: int, policy: str = "drop_oldest"):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        self.max_frames = max_frames
+        self.max_bytes = max_frames * frame_bytes
+        self.policy = policy
+        self.items = deque()  # (pcm or END_OF_SPEECH, received_at)
+        self.dropped_bytes = 0
+        self.dropped_frames = 0
+        self.closed = False
+        self._changed = asyncio.Condition()
+
+    @property
+    def depth(self) -> int:
+        return len(self.items)
+
+    @property
+    def full(self) -> bool:
+        return len(self.items) >= self.max_frames
+
+    async def put(self, pcm: bytes, received_at: float):
+        async with self._changed:
+            if pcm is not END_OF_SPEECH:
+                if self.policy == "block":
+                    await self._changed.wait_for(lambda: not self.full)
+                elif self.full and self.policy == "drop_oldest":
+                    self._drop_oldest_audio()
+                elif self.full and self.policy == "coalesce":
+                    self._coalesce()
+            self.items.append((pcm, received_at))
+            self._changed.notify_all()
+
+    async def get(self) -> Optional[Tuple[bytes, float]]:
+        """Next (pcm, received_at) item, or None once closed and drained."""
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.items or self.closed)
+            if not self.items:
+                return None
+            item = self.items.popleft()
+            self._changed.notify_all()
+            return item
+
+    async def close(self):
+        async with self._changed:
+            self.closed = True
+            self._changed.notify_all()
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth,
+            "max_frames": self.max_frames,
+            "policy": self.policy,
+            "dropped_frames": self.dropped_frames,
+            "dropped_bytes": self.dropped_bytes,
+        }
+
+    def _drop_oldest_audio(self):
+        for i, (pcm, _) in enumerate(self.items):
+            if pcm is not END_OF_SPEECH:
+                del self.items[i]
+                self.dropped_frames += 1
+                self.dropped_bytes += len(pcm)
+                return
+
+    def _coalesce(self):
+        merged = deque()
+        run: Optional[bytearray] = None
+        for pcm, received_at in self.items:
+            if pcm is END_OF_SPEECH:
+                merged.append((pcm, received_at))
+                run = None
+            elif run is None:
+                run = bytearray(pcm)
+                merged.append((run, received_at))
+            else:
+                run.extend(pcm)
+        self.items = merged
+
+        # Keep total queued audio within budget by trimming the oldest samples
+        excess = sum(len(pcm) for pcm, _ in self.items if pcm is not END_OF_SPEECH) - self.max_bytes
+        while excess > 0:
+            i = next(i for i, (pcm, _) in enumerate(self.items) if pcm is not END_OF_SPEECH)
+            pcm, received_at = self.items[i]
+            cut = min(excess + excess % 2, len(pcm))
+            if cut == len(pcm):
+                del self.items[i]
+                self.dropped_frames += 1
+            else:
+                self.items[i] = (pcm[cut:], received_at)
+            self.dropped_bytes += cut
+            excess -= cut
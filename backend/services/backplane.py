@@ -0,0 +1,126 @@
+import asyncio
+import os
+import uuid
+from typing import Callable, Dict, List, Optional
+
+from services.model_ipc import open_connection, read_frame, write_frame
+
+RECONNECT_INTERVAL = 2.0
+
+class Backplane:
+    """Pub/sub between backend processes for room broadcasts and presence.
+
+    Connection registries publish what their local members need to see on
+    other workers and subscribe to their channel for what other workers
+    publish. Messages are plain dicts; every process has a node_id so
+    subscribers can ignore their own messages. Implementations only need
+    start/publish/close; subscribe and dispatch are shared.
+    """
+
+    remote = True  # False: nothing ever leaves the process, publishing can be skipped
+
+    def __init__(self):
+        self.node_id = uuid.uuid4().hex
+        self._handlers: Dict[str, List[Callable[[dict], None]]] = {}
+        self._connect_callbacks: List[Callable[[], None]] = []
+
+    def subscribe(self, channel: str, handler: Callable[[dict], None]):
+        self._handlers.setdefault(channel, []).append(handler)
+
+    def on_connect(self, callback: Callable[[], None]):
+        # Called whenever the backplane (re)connects, e.g. to re-announce presence
+        self._connect_callbacks.append(callback)
+
+    async def start(self):
+        pass
+
+    async def publish(self, channel: str, message: dict):
+        pass
+
+    async def close(self):
+        pass
+
+    def dispatch(self, channel: str, message: dict):
+        for handler in self._handlers.get(channel, []):
+            try:
+                handler(message)
+            except Exception as e:
+                print(f"Backplane handler for {channel} failed: {str(e)}")
+
+    def dispatch_all(self, message: dict):
+        for channel in list(self._handlers):
+            self.dispatch(channel, message)
+
+    def connected(self):
+        for callback in self._connect_callbacks:
+            callback()
+
+class InProcessBackplane(Backplane):
+    """Single-process default: local delivery is all there is."""
+
+    remote = False
+
+class BrokerBackplane(Backplane):
+    """Relays through `python backplane_broker.py` on a Unix socket or host:port.
+
+    Messages published while the broker is unreachable are dropped (local
+    members still get them); the connection is retried in the background
+    and presence is re-announced once it is back.
+    """
+
+    def __init__(self, address: str):
+        super().__init__()
+        self.address = address
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def publish(self, channel: str, message: dict):
+        writer = self._writer
+        if writer is None:
+            return
+        try:
+            write_frame(writer, {"channel": channel, "message": {**message, "origin": self.node_id}})
+            await writer.drain()
+        except (ConnectionError, RuntimeError) as e:
+            print(f"Backplane publish failed: {str(e)}")
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+        if self._writer:
+            self._writer.close()
+
+    async def _run(self):
+        while True:
+            try:
+                reader, writer = await open_connection(self.address)
+                write_frame(writer, {"op": "hello", "node": self.node_id})
+                await writer.drain()
+                self._writer = writer
+                print(f"Backplane connected to {self.address}")
+                self.connected()
+                while True:
+                    header, _ = await read_frame(reader)
+                    if header.get("op") == "peer_down":
+                        self.dispatch_all({"kind": "peer_down", "origin": header["node"]})
+                    elif header.get("channel"):
+                        self.dispatch(header["channel"], header["message"])
+            except asyncio.CancelledError:
+                raise
+            except (OSError, asyncio.IncompleteReadError) as e:
+                print(f"Backplane connection to {self.address} lost: {str(e)}")
+            if self._writer:
+                self._writer.close()
+            self._writer = None
+            await asyncio.sleep(RECONNECT_INTERVAL)
+
+def create_backplane() -> Backplane:
+    # BACKPLANE_ADDRESS=/tmp/autointerviewer-backplane.sock (or host:port) to span workers
+    address = os.getenv("BACKPLANE_ADDRESS")
+    return BrokerBackplane(address) if address else InProcessBackplane()
+
+backplane = create_backplane()
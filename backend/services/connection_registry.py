@@ -0,0 +1,237 @@
+import asyncio
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from fastapi import WebSocket
+
+from services.backplane import Backplane, InProcessBackplane
+from services.metrics import metrics
+from services.room_state import RoomStateStore
+from services.ws_codec import JSON_CODEC
+
+class RoomConnection:
+    """A websocket in a room with its own bounded outgoing queue.
+
+    Messages are handed to the queue and written by a dedicated sender task,
+    so a broadcast never waits on any single client. A client that lets its
+    queue fill up or takes longer than send_timeout for one message is
+    considered dead and closed (the registry's watchdog checks sending_since,
+    which is cheaper than a timeout around every send).
+    """
+
+    def __init__(self, registry: "ConnectionRegistry", websocket: WebSocket, room_name: str, identity: str,
+                 codec=JSON_CODEC):
+        self.registry = registry
+        self.websocket = websocket
+        self.codec = codec
+        self.room_name = room_name
+        self.identity = identity
+        self.id = f"{room_name}:{identity}"
+        self.queue = deque()
+        self.ready = asyncio.Event()
+        self.sending_since: Optional[float] = None
+        self.task = asyncio.create_task(self._send_loop())
+
+    def enqueue(self, data) -> bool:
+        # data is already encoded with this connection's codec
+        if len(self.queue) >= self.registry.max_pending:
+            return False
+        self.queue.append(data)
+        self.ready.set()
+        return True
+
+    async def _send_loop(self):
+        try:
+            send = self.websocket.send_bytes if self.codec.binary else self.websocket.send_text
+            while True:
+                await self.ready.wait()
+                self.ready.clear()
+                # Everything queued since the last wakeup goes out in one pass
+                while self.queue:
+                    self.sending_since = time.monotonic()
+                    await send(self.queue.popleft())
+                    self.sending_since = None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            metrics.incr("ws.send_failures")
+            print(f"Dropping connection {self.id}: {type(e).__name__} {str(e)}")
+            await self.registry.drop(self)
+
+    async def close(self):
+        self.task.cancel()
+        try:
+            await self.websocket.close()
+        except Exception:
+            pass
+
+class ConnectionRegistry:
+    """Room-indexed websocket connections (room -> identity -> connection).
+
+    Broadcasting touches only the room's members, serializes the message
+    once per wire format in use, and enqueues it on each member's send
+    queue, so delivery to all of them happens concurrently.
+
+    Through the backplane, broadcasts and joins/leaves are also published on
+    the registry's namespace so the same room can have members on several
+    workers; local members are always served directly, never via the broker.
+    Local and remote members are mirrored into room_state for occupancy.
+    """
+
+    def __init__(self, namespace: str = "chat", backplane: Optional[Backplane] = None,
+                 max_pending: int = 64, send_timeout: float = 5.0, room_state: Optional[RoomStateStore] = None):
+        self.namespace = namespace
+        self.backplane = backplane or InProcessBackplane()
+        self.room_state = room_state or RoomStateStore()
+        self.max_pending = max_pending
+        self.send_timeout = send_timeout
+        self.rooms: Dict[str, Dict[str, RoomConnection]] = {}
+        # Members connected to other workers: room -> identity -> node id
+        self.remote_members: Dict[str, Dict[str, str]] = {}
+        self.backplane.subscribe(namespace, self._on_remote)
+        self.backplane.on_connect(self._on_backplane_connect)
+        self._watchdog: Optional[asyncio.Task] = None
+
+    async def connect(self, websocket: WebSocket, room_name: str, identity: str, codec=JSON_CODEC) -> str:
+        room = self.rooms.setdefault(room_name, {})
+        previous = room.get(identity)
+        connection = RoomConnection(self, websocket, room_name, identity, codec)
+        room[identity] = connection
+        if self._watchdog is None:
+            self._watchdog = asyncio.create_task(self._watch_sends())
+        # Same identity reconnecting: the new socket replaces the old one
+        if previous:
+            await previous.close()
+        else:
+            self.room_state.join(room_name, identity)
+        await self._publish({"kind": "join", "room": room_name, "identity": identity})
+        return connection.id
+
+    def get(self, connection_id: str) -> Optional[RoomConnection]:
+        room_name, _, identity = connection_id.partition(":")
+        return self.rooms.get(room_name, {}).get(identity)
+
+    def disconnect(self, connection_id: str, websocket: Optional[WebSocket] = None):
+        connection = self.get(connection_id)
+        # Ignore a stale handler whose socket was already replaced by a reconnect
+        if connection is None or (websocket is not None and connection.websocket is not websocket):
+            return
+        self._remove(connection)
+        connection.task.cancel()
+
+    async def drop(self, connection: RoomConnection):
+        if self.get(connection.id) is connection:
+            self._remove(connection)
+        await connection.close()
+
+    def send(self, connection_id: str, payload: dict) -> bool:
+        # Direct replies go through the same queue so they stay ordered with broadcasts
+        connection = self.get(connection_id)
+        return connection is not None and connection.enqueue(connection.codec.encode(payload))
+
+    def send_pong(self, connection_id: str) -> bool:
+        connection = self.get(connection_id)
+        return connection is not None and connection.enqueue(connection.codec.pong)
+
+    async def broadcast_to_room(self, room_name: str, message: str, sender: str, exclude: str = None) -> int:
+        payload = {
+            "type": "message",
+            "message": message,
+            "sender": sender
+        }
+        delivered = self.fan_out(room_name, payload, exclude)
+        if self.backplane.remote:
+            await self._publish({"kind": "broadcast", "room": room_name, "payload": payload, "exclude": exclude})
+        return delivered
+
+    def fan_out(self, room_name: str, payload: dict, exclude: str = None) -> int:
+        delivered = 0
+        encoded = {}
+        for connection in list(self.rooms.get(room_name, {}).values()):
+            if connection.id == exclude:
+                continue
+            codec = connection.codec
+            if codec.name not in encoded:
+                encoded[codec.name] = codec.encode(payload)
+            if connection.enqueue(encoded[codec.name]):
+                delivered += 1
+            else:
+                # Too far behind to catch up; don't let it hold memory or the room
+                metrics.incr("ws.slow_consumers_dropped")
+                asyncio.create_task(self.drop(connection))
+        return delivered
+
+    def members(self, room_name: str) -> List[str]:
+        return sorted(set(self.rooms.get(room_name, {})) | set(self.remote_members.get(room_name, {})))
+
+    def room_size(self, room_name: str) -> int:
+        return len(self.members(room_name))
+
+    def _remove(self, connection: RoomConnection):
+        room = self.rooms.get(connection.room_name)
+        if room and room.get(connection.identity) is connection:
+            del room[connection.identity]
+            if not room:
+                del self.rooms[connection.room_name]
+            self.room_state.leave(connection.room_name, connection.identity)
+            asyncio.create_task(self._publish({"kind": "leave", "room": connection.room_name, "identity": connection.identity}))
+
+    async def _watch_sends(self):
+        while True:
+            await asyncio.sleep(self.send_timeout / 2)
+            deadline = time.monotonic() - self.send_timeout
+            for room in list(self.rooms.values()):
+                for connection in list(room.values()):
+                    if connection.sending_since is not None and connection.sending_since < deadline:
+                        metrics.incr("ws.send_timeouts")
+                        print(f"Dropping connection {connection.id}: send timed out")
+                        # Closing a stuck client can take the whole close handshake timeout
+                        connection.sending_since = None
+                        asyncio.create_task(self.drop(connection))
+
+    async def _publish(self, message: dict):
+        if not self.backplane.remote:
+            return
+        await self.backplane.publish(self.namespace, message)
+
+    def _announce(self):
+        for room_name, room in self.rooms.items():
+            for identity in room:
+                asyncio.create_task(self._publish({"kind": "join", "room": room_name, "identity": identity}))
+
+    def _on_backplane_connect(self):
+        # Ask the other workers for their members, and tell them about ours
+        asyncio.create_task(self._publish({"kind": "sync"}))
+        self._announce()
+
+    def _on_remote(self, message: dict):
+        origin = message.get("origin")
+        if origin == self.backplane.node_id:
+            return
+        kind = message.get("kind")
+        if kind == "broadcast":
+            self.fan_out(message["room"], message["payload"], message.get("exclude"))
+        elif kind == "join":
+            room = self.remote_members.setdefault(message["room"], {})
+            # Joins are re-announced on every sync; count each member once
+            if message["identity"] not in room:
+                self.room_state.join(message["room"], message["identity"])
+            room[message["identity"]] = origin
+        elif kind == "leave":
+            room = self.remote_members.get(message["room"], {})
+            if room.get(message["identity"]) == origin:
+                del room[message["identity"]]
+                self.room_state.leave(message["room"], message["identity"])
+                if not room:
+                    del self.remote_members[message["room"]]
+        elif kind == "sync":
+            self._announce()
+        elif kind == "peer_down":
+            for room_name in list(self.remote_members):
+                room = self.remote_members[room_name]
+                for identity in [identity for identity, node in room.items() if node == origin]:
+                    del room[identity]
+                    self.room_state.leave(room_name, identity)
+                if not room:
+                    del self.remote_members[room_name]
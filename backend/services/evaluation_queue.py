@@ -0,0 +1,174 @@
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Set
+
+from models.evaluation_job import EvaluationJob
+from models.interview_evaluation import InterviewEvaluation
+from services.metrics import metrics
+
+class EvaluationQueue:
+    """Candidate evaluations run as persistent background jobs.
+
+    Every submission is stored as an EvaluationJob row and handed to a fixed
+    number of workers, so a bulk re-score of many interviews never has more
+    than `workers` LLM calls in flight. Each call is bounded by `timeout`;
+    failures are retried with a growing delay up to max_attempts and then
+    marked failed.
+
+    Several backend processes can share the table: a job is claimed with a
+    conditional UPDATE (queued -> running) before it runs, so only one
+    process ever evaluates it. A running job whose started_at is older than
+    `lease` belongs to a process that died (a live one gives up after
+    `timeout`), and is put back in the queue by the periodic sweep, which
+    also picks up queued jobs nobody holds.
+    """
+
+    def __init__(self, evaluate, session_factory, workers: int = 2, timeout: float = 180.0,
+                 max_attempts: int = 3, retry_delay: float = 10.0, lease: Optional[float] = None):
+        self.evaluate = evaluate  # coroutine function: (candidate_id, conversation) -> (evaluation_text, score)
+        self.session_factory = session_factory
+        self.workers = workers
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.lease = lease or timeout * 2
+        self._queue: Optional[asyncio.Queue] = None
+        self._pending: Set[str] = set()  # job ids in our queue or waiting out a retry delay
+        self._tasks = []
+        self._waiters: Dict[str, asyncio.Event] = {}
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        resumed = self._recover()
+        if resumed:
+            print(f"Resuming {resumed} unfinished evaluation jobs")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._sweep()))
+
+    def _enqueue(self, job_id: str):
+        self._pending.add(job_id)
+        self._queue.put_nowait(job_id)
+
+    def _recover(self) -> int:
+        """Queue jobs no live process is working on; returns how many."""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.lease)
+        db = self.session_factory()
+        try:
+            # Expired leases: the process running them is gone
+            expired = [job_id for (job_id,) in db.query(EvaluationJob.id).filter(
+                EvaluationJob.status == "running", EvaluationJob.started_at < cutoff)]
+            for job_id in expired:
+                db.query(EvaluationJob).filter(
+                    EvaluationJob.id == job_id, EvaluationJob.status == "running", EvaluationJob.started_at < cutoff
+                ).update({"status": "queued"}, synchronize_session=False)
+            db.commit()
+            # Queued jobs may also sit in another process's queue; whoever claims first runs them
+            queued = [job_id for (job_id,) in db.query(EvaluationJob.id).filter(EvaluationJob.status == "queued")
+                      if job_id not in self._pending]
+        finally:
+            db.close()
+        for job_id in queued:
+            self._enqueue(job_id)
+        metrics.set_gauge("evaluation.queue_depth", self._queue.qsize())
+        return len(queued)
+
+    async def _sweep(self):
+        while True:
+            await asyncio.sleep(self.lease)
+            try:
+                self._recover()
+            except Exception as e:
+                print(f"Evaluation job sweep failed: {str(e)}")
+
+    def submit(self, db, candidate_id: int, conversation: list) -> EvaluationJob:
+        job = EvaluationJob(id=uuid.uuid4().hex, candidate_id=candidate_id, conversation=conversation, status="queued")
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        self._enqueue(job.id)
+        metrics.set_gauge("evaluation.queue_depth", self._queue.qsize())
+        return job
+
+    async def wait(self, job_id: str, timeout: float) -> bool:
+        """Wait for a job submitted by this caller to finish; False on timeout."""
+        event = self._waiters.setdefault(job_id, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._waiters.pop(job_id, None)
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            metrics.set_gauge("evaluation.queue_depth", self._queue.qsize())
+            retrying = False
+            try:
+                retrying = await self._run(job_id)
+            except Exception as e:
+                print(f"Evaluation job {job_id} crashed: {str(e)}")
+            if not retrying:
+                self._pending.discard(job_id)
+
+    async def _run(self, job_id: str) -> bool:
+        """Claim and run a job; True if it was scheduled for a retry here."""
+        db = self.session_factory()
+        try:
+            # Atomic claim: another process (or a duplicate queue entry) may have taken it
+            claimed = db.query(EvaluationJob).filter(
+                EvaluationJob.id == job_id, EvaluationJob.status == "queued"
+            ).update({
+                "status": "running",
+                "started_at": datetime.utcnow(),
+                "attempts": EvaluationJob.attempts + 1
+            }, synchronize_session=False)
+            db.commit()
+            if not claimed:
+                return False
+            job = db.get(EvaluationJob, job_id)
+
+            start = time.perf_counter()
+            try:
+                evaluation_text, score = await asyncio.wait_for(self.evaluate(job.candidate_id, job.conversation), self.timeout)
+            except Exception as e:
+                job.error = str(e) or type(e).__name__
+                if job.attempts < self.max_attempts:
+                    # Back off so an LLM outage doesn't turn into a retry storm
+                    job.status = "queued"
+                    db.commit()
+                    metrics.incr("evaluation.retries")
+                    asyncio.get_running_loop().call_later(self.retry_delay * job.attempts, self._queue.put_nowait, job_id)
+                    return True
+                job.status = "failed"
+                job.finished_at = datetime.utcnow()
+                db.commit()
+                metrics.incr("evaluation.failed")
+                self._notify(job_id)
+                return False
+
+            evaluation = InterviewEvaluation(
+                candidate_id=job.candidate_id,
+                evaluation_text=evaluation_text,
+                score=score
+            )
+            db.add(evaluation)
+            db.flush()
+            job.evaluation_id = evaluation.id
+            job.status = "completed"
+            job.error = None
+            job.finished_at = datetime.utcnow()
+            db.commit()
+            metrics.observe("evaluation.job", time.perf_counter() - start)
+            self._notify(job_id)
+            return False
+        finally:
+            db.close()
+
+    def _notify(self, job_id: str):
+        event = self._waiters.get(job_id)
+        if event:
+            event.set()
@@ -0,0 +1,83 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+def truncate_to_token_budget(text: str, budget: int) -> str:
+    """Keep roughly the first `budget` tokens (~4 characters each) of text."""
+    max_chars = budget * 4
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind(" ", 0, max_chars)
+    return text[:cut if cut > 0 else max_chars].rstrip() + " ..."
+
+class InterviewSession:
+    """LLM state carried from one turn of an interview to the next.
+
+    The first turn sends the stable prefix (instructions, resume, job
+    description) followed by the turn prompt. Later turns send only the turn
+    prompt together with the `context` Ollama returned last time, so the
+    prefix and earlier turns are not evaluated again. Once the context grows
+    past max_context_tokens it is dropped and the next turn starts over from
+    the prefix.
+    """
+
+    def __init__(self, session_id: str, prefix: str, max_context_tokens: int):
+        self.id = session_id
+        self.prefix = prefix
+        self.max_context_tokens = max_context_tokens
+        self.context: Optional[List[int]] = None
+        self.turns = 0
+        self.resets = 0
+        self.last_used = time.time()
+        self.lock = asyncio.Lock()  # one turn at a time; each turn extends the context
+
+    def request(self, turn_prompt: str) -> dict:
+        """Keyword arguments for LLMClient.generate/stream for this turn."""
+        self.last_used = time.time()
+        if self.context:
+            return {"prompt": turn_prompt, "context": self.context}
+        return {"prompt": self.prefix + turn_prompt}
+
+    def update(self, response: dict):
+        self.turns += 1
+        context = response.get("context")
+        if context and len(context) > self.max_context_tokens:
+            self.resets += 1
+            context = None
+        self.context = context or None
+
+class InterviewSessionStore:
+    def __init__(self, max_sessions: int = 1000, ttl_seconds: float = 3600, max_context_tokens: int = 3072):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_context_tokens = max_context_tokens
+        self.sessions: "OrderedDict[str, InterviewSession]" = OrderedDict()
+
+    def get_or_create(self, session_id: str, prefix: str) -> InterviewSession:
+        self._expire()
+        session = self.sessions.get(session_id)
+        # A different resume or job description means a different interview
+        if session is None or session.prefix != prefix:
+            session = InterviewSession(session_id, prefix, self.max_context_tokens)
+            self.sessions[session_id] = session
+        self.sessions.move_to_end(session_id)
+        while len(self.sessions) > self.max_sessions:
+            self.sessions.popitem(last=False)
+        return session
+
+    def drop(self, session_id: str) -> bool:
+        return self.sessions.pop(session_id, None) is not None
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self.sessions),
+            "turns": sum(session.turns for session in self.sessions.values()),
+            "context_resets": sum(session.resets for session in self.sessions.values()),
+        }
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl_seconds
+        expired = [session_id for session_id, session in self.sessions.items() if session.last_used < cutoff]
+        for session_id in expired:
+            del self.sessions[session_id]
@@ -0,0 +1,86 @@
+import json
+import re
+from typing import Optional, Tuple
+
+# A complete JSON string literal, escapes included
+STRING = re.compile(r'"(?:\\.|[^"\\])*"')
+
+def extract_json(text: str) -> Tuple[Optional[dict], bool]:
+    """Return (object, repaired) for the JSON object in an LLM reply.
+
+    Valid JSON is parsed as is. Otherwise the outermost {...} is cut out of
+    any surrounding prose or code fences, closed if generation stopped
+    early, and common near-JSON mistakes are fixed. (None, False) if nothing
+    usable remains.
+    """
+    try:
+        value = json.loads(text, strict=False)
+        if isinstance(value, dict):
+            return value, False
+    except json.JSONDecodeError:
+        pass
+    candidate = _outermost_object(text)
+    if candidate is None:
+        return None, False
+    for attempt in (candidate, _repair(candidate)):
+        try:
+            value = json.loads(attempt, strict=False)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(value, dict):
+            return value, True
+    return None, False
+
+def _outermost_object(text: str) -> Optional[str]:
+    start = text.find("{")
+    if start < 0:
+        return None
+    closers = []
+    in_string = False
+    escaped = False
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            closers.append("}" if char == "{" else "]")
+        elif char in "}]":
+            if closers:
+                closers.pop()
+            if not closers:
+                return text[start:i + 1]
+    # Generation stopped mid-object: close whatever is still open
+    tail = text[start:].rstrip()
+    if in_string:
+        tail += '"'
+    return tail + "".join(reversed(closers))
+
+def _repair_outside_strings(fragment: str) -> str:
+    fragment = re.sub(r'\bNone\b', "null", fragment)
+    fragment = re.sub(r'\bTrue\b', "true", fragment)
+    fragment = re.sub(r'\bFalse\b', "false", fragment)
+    # {key: ...} -> {"key": ...}
+    return re.sub(r'([{,]\s*)([A-Za-z_][\w-]*)(\s*:)', r'\1"\2"\3', fragment)
+
+def _repair(candidate: str) -> str:
+    parts = []
+    position = 0
+    for match in STRING.finditer(candidate):
+        parts.append(_repair_outside_strings(candidate[position:match.start()]))
+        parts.append(match.group())
+        position = match.end()
+    parts.append(_repair_outside_strings(candidate[position:]))
+    repaired = "".join(parts)
+    # Missing comma between a value and the next key on a new line
+    repaired = re.sub(r'("|\d|true|false|null|[}\]])(\s*\n\s*")', r'\1,\2', repaired)
+    # Key whose value was cut off: {"a": 1, "b":}
+    repaired = re.sub(r'(,\s*)?"(?:\\.|[^"\\])*"\s*:\s*(?=[}\]])', "", repaired)
+    # Trailing commas
+    return re.sub(r',(\s*[}\]])', r'\1', repaired)
@@ -0,0 +1,94 @@
+import base64
+import hashlib
+import hmac
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from services.metrics import metrics
+
+# Video grants per panel role, fixed server-side; every token also gets
+# roomJoin for its room. The default role gets nothing beyond that.
+ROLE_GRANTS: Dict[str, Dict[str, bool]] = {
+    "participant": {},
+    "candidate": {"canPublish": True, "canSubscribe": True},
+    "interviewer": {"canPublish": True, "canSubscribe": True},
+    "observer": {"canPublish": False, "canSubscribe": True},
+}
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+class LiveKitTokenService:
+    """Issues LiveKit access tokens (HS256 JWTs), reusing still-valid ones.
+
+    Tokens are cached per (room, identity, name, role grants) and handed out
+    again until they are within refresh_margin of expiring, so a reconnect
+    storm doesn't re-sign the same token over and over. Signing itself
+    skips the generic JWT path: the header segment is encoded once and the
+    HMAC is keyed once, then copied per token.
+    """
+
+    def __init__(self, api_key: str, api_secret: str, ttl_seconds: int = 3600,
+                 refresh_margin: int = 300, max_entries: int = 10000):
+        self.api_key = api_key
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin = min(refresh_margin, ttl_seconds // 2)
+        self.max_entries = max_entries
+        self._header = _b64(json.dumps({"alg": "HS256", "typ": "JWT"}, separators=(",", ":")).encode()) + "."
+        self._hmac = hmac.new(api_secret.encode(), digestmod=hashlib.sha256)
+        self.entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def sign(self, payload: dict) -> str:
+        signing_input = self._header + _b64(json.dumps(payload, separators=(",", ":")).encode())
+        mac = self._hmac.copy()
+        mac.update(signing_input.encode())
+        return signing_input + "." + _b64(mac.digest())
+
+    def issue(self, room_name: str, identity: str, name: Optional[str] = None,
+              role: str = "participant") -> dict:
+        if role not in ROLE_GRANTS:
+            raise ValueError(f"Unknown role '{role}' (available: {', '.join(ROLE_GRANTS)})")
+        name = name or identity
+        grants = ROLE_GRANTS[role]
+        key = (room_name, identity, name, tuple(sorted(grants.items())))
+        now = int(time.time())
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] - now > self.refresh_margin:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                metrics.incr("livekit.token_cache_hits")
+                return {"token": entry[0], "expires_at": entry[1]}
+            self.misses += 1
+        metrics.incr("livekit.token_cache_misses")
+
+        exp = now + self.ttl_seconds
+        token = self.sign({
+            "iss": self.api_key,
+            "sub": identity,
+            "exp": exp,
+            "nbf": now,
+            "name": name,
+            "video": {**grants, "room": room_name, "roomJoin": True}
+        })
+        with self._lock:
+            self.entries[key] = (token, exp)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return {"token": token, "expires_at": exp}
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
@@ -0,0 +1,76 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from services.metrics import metrics
+from services.tts_cache import normalize_text
+
+def _normalize(value):
+    if isinstance(value, str):
+        return normalize_text(value)
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    return value
+
+class LLMResponseCache:
+    """In-memory LRU of LLM results with a time-to-live.
+
+    Keys are a hash of the model, the kind of call and the prompt fields
+    (whitespace/unicode-normalized, canonical JSON), so a retried or
+    re-sent request gets the earlier answer instead of a new generation.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600, enabled: bool = True):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model: str, kind: str, fields: dict) -> str:
+        canonical = json.dumps(_normalize({"model": model, "kind": kind, "fields": fields}), sort_keys=True)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self.entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+            else:
+                self.entries.move_to_end(key)
+                self.hits += 1
+            metrics.incr("llm.cache_hits" if entry else "llm.cache_misses")
+            metrics.set_gauge("llm.cache_hit_rate", round(self.hits / (self.hits + self.misses), 3))
+        return entry[1] if entry else None
+
+    def put(self, key: str, value: dict):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
@@ -0,0 +1,127 @@
+import json
+import os
+import re
+import time
+from typing import AsyncIterator, List, Optional, Tuple
+
+import httpx
+import ollama
+
+from services.metrics import metrics
+
+LLM_MODEL = os.getenv("LLM_MODEL", "mistral")
+
+class LLMClient:
+    """Async Ollama client sharing one pooled HTTP connection set.
+
+    Calls never block the event loop, and keep-alive connections to Ollama
+    are reused across requests instead of being opened per call.
+    """
+
+    def __init__(self, model: str = LLM_MODEL, host: Optional[str] = None, max_connections: int = 8):
+        self.model = model
+        self.client = ollama.AsyncClient(
+            host=host,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+
+    async def generate(self, prompt: str, **options) -> dict:
+        start = time.perf_counter()
+        response = await self.client.generate(model=self.model, prompt=prompt, **options)
+        metrics.observe("llm.generate", time.perf_counter() - start)
+        self._record_eval(response)
+        return response
+
+    async def stream(self, prompt: str, **options) -> AsyncIterator[dict]:
+        """Yield Ollama's chunks as they arrive; the last one has done=True."""
+        start = time.perf_counter()
+        first = True
+        async for chunk in await self.client.generate(model=self.model, prompt=prompt, stream=True, **options):
+            if first:
+                metrics.observe("llm.first_token", time.perf_counter() - start)
+                first = False
+            if chunk.get("done"):
+                self._record_eval(chunk)
+            yield chunk
+        metrics.observe("llm.generate", time.perf_counter() - start)
+
+    def _record_eval(self, response: dict):
+        # Time Ollama spent on the prompt itself; shrinks when context is reused
+        if response.get("prompt_eval_duration"):
+            metrics.observe("llm.prompt_eval", response["prompt_eval_duration"] / 1e9)
+        if response.get("prompt_eval_count") is not None:
+            metrics.set_gauge("llm.prompt_eval_tokens", response["prompt_eval_count"])
+
+def _scan_string(text: str, start: int) -> Tuple[str, bool]:
+    # Raw JSON string body from start up to the closing quote, if it has arrived
+    escaped = False
+    for i in range(start, len(text)):
+        char = text[i]
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char == '"':
+            return text[start:i], True
+    return text[start:], False
+
+def _decode_partial(raw: str) -> str:
+    # Drop an escape sequence that is still being generated, then decode
+    raw = re.sub(r'\\(u[0-9a-fA-F]{0,3})?$', "", raw)
+    try:
+        return json.loads(f'"{raw}"')
+    except json.JSONDecodeError:
+        return raw
+
+class QuestionStreamParser:
+    """Pulls the "question" value out of the model's JSON while it is generated.
+
+    feed() takes each token and returns the question's sentences that became
+    complete with it, so speech can start before the rest of the JSON
+    (feedback, score, ...) has been produced.
+    """
+
+    KEY = re.compile(r'"question"\s*:\s*"')
+
+    def __init__(self):
+        self.text = ""
+        self.question = ""
+        self.found = False
+        self.complete = False
+        self._start: Optional[int] = None
+        self._emitted = 0
+
+    @staticmethod
+    def split_text(text: str) -> List[str]:
+        return [sentence for sentence in re.split(r'(?<=[.!?])\s+', text.strip()) if sentence]
+
+    def feed(self, chunk: str) -> List[str]:
+        self.text += chunk
+        if self.complete:
+            return []
+        if self._start is None:
+            match = self.KEY.search(self.text)
+            if not match:
+                return []
+            self._start = match.end()
+            self.found = True
+        raw, self.complete = _scan_string(self.text, self._start)
+        self.question = _decode_partial(raw)
+        return self._take_sentences(final=self.complete)
+
+    def _take_sentences(self, final: bool) -> List[str]:
+        pending = self.question[self._emitted:]
+        sentences = []
+        position = 0
+        for boundary in re.finditer(r'(?<=[.!?])\s+', pending):
+            sentence = pending[position:boundary.start()].strip()
+            if sentence:
+                sentences.append(sentence)
+            position = boundary.end()
+        if final and pending[position:].strip():
+            sentences.append(pending[position:].strip())
+            position = len(pending)
+        self._emitted += position
+        return sentences
+
+llm_client = LLMClient()
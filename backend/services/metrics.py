@@ -0,0 +1,61 @@
+import threading
+from collections import deque
+from typing import Dict
+
+class LatencyStats:
+    """Rolling latency window (seconds in, milliseconds out)."""
+
+    def __init__(self, window: int = 1000):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def snapshot(self) -> dict:
+        if not self.samples:
+            return {"count": self.count}
+        ordered = sorted(self.samples)
+        last = len(ordered) - 1
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 2),
+            "p50_ms": round(ordered[last // 2] * 1000, 2),
+            "p95_ms": round(ordered[int(last * 0.95)] * 1000, 2),
+            "max_ms": round(ordered[last] * 1000, 2),
+        }
+
+class MetricsRegistry:
+    """Process-wide counters, gauges and latency windows for the /metrics endpoint."""
+
+    def __init__(self):
+        self.counters: Dict[str, int] = {}
+        self.gauges: Dict[str, float] = {}
+        self.latencies: Dict[str, LatencyStats] = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, value: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float):
+        self.gauges[name] = value
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            if name not in self.latencies:
+                self.latencies[name] = LatencyStats()
+            self.latencies[name].observe(seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "latencies": {name: stats.snapshot() for name, stats in self.latencies.items()},
+            }
+
+metrics = MetricsRegistry()
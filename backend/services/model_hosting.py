@@ -0,0 +1,35 @@
+import os
+
+from services.model_ipc import ModelServerClient, RemoteTTS, RemoteWhisper
+
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "base")  # You can use "tiny", "base", "small", "medium", or "large"
+TTS_MODEL = "tts_models/en/ljspeech/tacotron2-DDC"
+
+# When set, API workers send inference to `python model_server.py` instead of
+# loading weights themselves: a Unix socket path, or host:port where there are none
+MODEL_SERVER_ADDRESS = os.getenv("MODEL_SERVER_ADDRESS")
+# Seconds to wait for a model server reply; 0 disables. Transcriptions get their
+# own limit since long CPU transcriptions are what the async job mode is for
+MODEL_SERVER_TIMEOUT = float(os.getenv("MODEL_SERVER_TIMEOUT", "120"))
+MODEL_SERVER_TRANSCRIBE_TIMEOUT = float(os.getenv("MODEL_SERVER_TRANSCRIBE_TIMEOUT", "0"))
+
+def load_whisper():
+    # Imported here so torch/whisper only load in processes that transcribe
+    import whisper
+    from services.whisper_batcher import WhisperBatcher
+    # Concurrent uploads share encoder/decoder passes instead of running one by one
+    return WhisperBatcher(whisper.load_model(WHISPER_MODEL))
+
+def load_tts():
+    from TTS.api import TTS
+    from services.tts_engine import TTSEngine
+    return TTSEngine(TTS(model_name=TTS_MODEL, progress_bar=False), workers=int(os.getenv("TTS_WORKERS", "1")))
+
+def register_models(registry, server_address=MODEL_SERVER_ADDRESS):
+    if server_address:
+        client = ModelServerClient(server_address, timeout=MODEL_SERVER_TIMEOUT)
+        registry.register("whisper", lambda: RemoteWhisper(client, timeout=MODEL_SERVER_TRANSCRIBE_TIMEOUT))
+        registry.register("tts", lambda: RemoteTTS(client))
+    else:
+        registry.register("whisper", load_whisper)
+        registry.register("tts", load_tts)
@@ -0,0 +1,135 @@
+import asyncio
+import itertools
+import json
+import struct
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+# Frame: header length, payload length, JSON header, raw payload (PCM etc.)
+FRAME_HEADER = struct.Struct("!II")
+
+async def read_frame(reader: asyncio.StreamReader) -> Tuple[dict, bytes]:
+    header_size, payload_size = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+    header = json.loads(await reader.readexactly(header_size))
+    payload = await reader.readexactly(payload_size) if payload_size else b""
+    return header, payload
+
+def write_frame(writer: asyncio.StreamWriter, header: dict, payload: bytes = b""):
+    encoded = json.dumps(header).encode()
+    writer.write(FRAME_HEADER.pack(len(encoded), len(payload)) + encoded)
+    if payload:
+        writer.write(payload)
+
+def parse_address(address: str):
+    """"host:port" means TCP (e.g. on Windows); anything else is a Unix socket path."""
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and "/" not in address:
+        return host or "127.0.0.1", int(port)
+    return address
+
+async def open_connection(address: str):
+    target = parse_address(address)
+    if isinstance(target, tuple):
+        return await asyncio.open_connection(*target)
+    return await asyncio.open_unix_connection(target)
+
+class ModelServerError(Exception):
+    pass
+
+class ModelServerClient:
+    """One multiplexed connection from an API worker to the model server.
+
+    Requests from every coroutine in the worker share the connection and are
+    matched to responses by id, so the server sees them concurrently and can
+    batch them with requests from other workers. A dropped connection fails
+    the requests in flight and is reopened on the next call. `timeout` is
+    the default per-request limit in seconds; 0 means none.
+    """
+
+    def __init__(self, address: str, timeout: float = 120.0):
+        self.address = address
+        self.timeout = timeout
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+        self._connect_lock: Optional[asyncio.Lock] = None
+
+    async def request(self, op: str, payload: bytes = b"", timeout: Optional[float] = None,
+                      **params) -> Tuple[dict, bytes]:
+        await self._ensure_connected()
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            write_frame(self._writer, {"id": request_id, "op": op, **params}, payload)
+            await self._writer.drain()
+            limit = self.timeout if timeout is None else timeout
+            header, body = await (asyncio.wait_for(future, limit) if limit > 0 else future)
+        finally:
+            self._pending.pop(request_id, None)
+        if header.get("error"):
+            raise ModelServerError(header["error"])
+        return header, body
+
+    async def _ensure_connected(self):
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if self._writer is not None and not self._writer.is_closing():
+                return
+            self._reader, self._writer = await open_connection(self.address)
+            self._reader_task = asyncio.create_task(self._read_responses(self._reader))
+
+    async def _read_responses(self, reader: asyncio.StreamReader):
+        try:
+            while True:
+                header, payload = await read_frame(reader)
+                future = self._pending.get(header.get("id"))
+                if future is not None and not future.done():
+                    future.set_result((header, payload))
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            print(f"Model server connection lost: {str(e)}")
+        finally:
+            if self._writer is not None:
+                self._writer.close()
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ModelServerError("Model server connection lost"))
+
+class RemoteWhisper:
+    """Stands in for WhisperBatcher in workers that don't host Whisper themselves.
+
+    Transcription of a long upload on CPU can take far longer than other
+    requests, so it has its own timeout (0, the default, means none; a lost
+    connection still fails the request).
+    """
+
+    def __init__(self, client: ModelServerClient, timeout: float = 0):
+        self.client = client
+        self.timeout = timeout
+
+    async def transcribe(self, audio: np.ndarray) -> dict:
+        header, _ = await self.client.request("transcribe", np.asarray(audio, dtype=np.float32).tobytes(),
+                                              timeout=self.timeout)
+        return header["result"]
+
+class RemoteTTS:
+    """Stands in for TTSEngine in workers that don't host TTS themselves."""
+
+    def __init__(self, client: ModelServerClient):
+        self.client = client
+        self._sample_rate: Optional[int] = None
+
+    async def synthesize(self, text: str) -> bytes:
+        header, pcm = await self.client.request("synthesize", text=text)
+        self._sample_rate = header["sample_rate"]
+        return pcm
+
+    async def sample_rate(self) -> int:
+        if self._sample_rate is None:
+            header, _ = await self.client.request("tts_info")
+            self._sample_rate = header["sample_rate"]
+        return self._sample_rate
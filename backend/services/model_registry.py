@@ -0,0 +1,97 @@
+import asyncio
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Set
+
+from services.model_hosting import register_models
+
+class ModelNotHostedError(Exception):
+    pass
+
+class ModelRegistry:
+    """Loads heavy models on first use instead of at import time.
+
+    Each model name has a loader; nothing is imported or loaded until a
+    request (or the optional background warm-up) asks for the model. With
+    MODEL_SERVER_ADDRESS set the loaders return proxies to the model server.
+    HOSTED_MODELS picks which models this process may load at all, so a
+    worker that only serves CRUD traffic never pays for Whisper or TTS.
+    """
+
+    def __init__(self, hosted: Optional[Set[str]] = None):
+        self.hosted = hosted  # None means every registered model
+        self._loaders: Dict[str, Callable] = {}
+        self._models: Dict[str, object] = {}
+        self._states: Dict[str, str] = {}
+        self._errors: Dict[str, str] = {}
+        self._load_seconds: Dict[str, float] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+
+    def register(self, name: str, loader: Callable):
+        self._loaders[name] = loader
+        self._locks[name] = threading.Lock()
+        self._states[name] = "not_loaded" if self.is_hosted(name) else "not_hosted"
+
+    def is_hosted(self, name: str) -> bool:
+        return self.hosted is None or name in self.hosted
+
+    def require(self, name: str):
+        if name not in self._loaders or not self.is_hosted(name):
+            raise ModelNotHostedError(f"Model '{name}' is not hosted by this process")
+
+    def get(self, name: str):
+        """Return the model, loading it on this thread if needed (blocking)."""
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        self.require(name)
+        with self._locks[name]:
+            if name not in self._models:
+                self._states[name] = "loading"
+                start = time.perf_counter()
+                try:
+                    self._models[name] = self._loaders[name]()
+                except Exception as e:
+                    self._states[name] = "failed"
+                    self._errors[name] = str(e)
+                    raise
+                self._load_seconds[name] = round(time.perf_counter() - start, 2)
+                self._states[name] = "ready"
+                self._errors.pop(name, None)
+        return self._models[name]
+
+    async def aget(self, name: str):
+        """Return the model without blocking the event loop while it loads."""
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        return await asyncio.get_running_loop().run_in_executor(None, self.get, name)
+
+    async def warm_up(self):
+        for name in self._loaders:
+            if self.is_hosted(name):
+                try:
+                    await self.aget(name)
+                except Exception as e:
+                    print(f"Failed to load model {name}: {str(e)}")
+
+    def status(self) -> dict:
+        return {
+            name: {
+                "state": self._states[name],
+                "load_seconds": self._load_seconds.get(name),
+                "error": self._errors.get(name),
+            }
+            for name in self._loaders
+        }
+
+def _hosted_from_env() -> Optional[Set[str]]:
+    # e.g. HOSTED_MODELS=whisper,tts ; HOSTED_MODELS= (empty) hosts none
+    value = os.getenv("HOSTED_MODELS")
+    if value is None:
+        return None
+    return {name.strip() for name in value.split(",") if name.strip()}
+
+model_registry = ModelRegistry(_hosted_from_env())
+register_models(model_registry)
@@ -0,0 +1,117 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+# How long a room created through the API may sit without anyone joining
+ROOM_EMPTY_TTL = int(os.getenv("ROOM_EMPTY_TTL", "3600"))
+
+class Participant:
+    def __init__(self, identity: str):
+        self.identity = identity
+        self.joined_at = time.time()
+        # One person can hold several sockets (chat + livekit, or several workers)
+        self.connections = 0
+
+class RoomState:
+    def __init__(self, name: str, metadata: str = ""):
+        self.name = name
+        self.metadata = metadata
+        self.creation_time = int(time.time())
+        self.participants: Dict[str, Participant] = {}
+
+    @property
+    def num_participants(self) -> int:
+        return len(self.participants)
+
+    def to_dict(self, include_participants: bool = False) -> dict:
+        room = {
+            "name": self.name,
+            "num_participants": self.num_participants,
+            "metadata": self.metadata,
+            "creation_time": self.creation_time
+        }
+        if include_participants:
+            room["participants"] = [
+                {"identity": p.identity, "joined_at": p.joined_at}
+                for p in sorted(self.participants.values(), key=lambda p: p.joined_at)
+            ]
+        return room
+
+class RoomStateStore:
+    """Room occupancy, join times and metadata, kept up to date incrementally.
+
+    Connection registries call join/leave as sockets come and go (their own
+    and, through the backplane, those of other workers), so occupancy is a
+    dict lookup instead of a scan over connections. Rooms created through
+    the API keep their metadata until their last participant leaves; rooms
+    that only exist because someone joined disappear the same way. A room
+    created through the API that nobody joins within empty_ttl seconds is
+    dropped on the next create/get/live_rooms call. Those rooms are kept in
+    creation order, so expiring them only looks at the ones that are due.
+    """
+
+    def __init__(self, empty_ttl: float = ROOM_EMPTY_TTL):
+        self.empty_ttl = empty_ttl
+        self.rooms: Dict[str, RoomState] = {}
+        # Rooms nobody has joined yet -> monotonic deadline, oldest first
+        self.unjoined: "OrderedDict[str, float]" = OrderedDict()
+
+    def _expire(self):
+        now = time.monotonic()
+        while self.unjoined:
+            name, deadline = next(iter(self.unjoined.items()))
+            if deadline > now:
+                break
+            del self.unjoined[name]
+            room = self.rooms.get(name)
+            if room is not None and not room.participants:
+                del self.rooms[name]
+
+    def create(self, name: str, metadata: Optional[str] = None) -> RoomState:
+        self._expire()
+        room = self.rooms.get(name)
+        if room is None:
+            room = self.rooms[name] = RoomState(name, metadata or "")
+        elif metadata is not None:
+            room.metadata = metadata
+        if not room.participants:
+            # (Re)creating an empty room restarts its clock
+            self.unjoined[name] = time.monotonic() + self.empty_ttl
+            self.unjoined.move_to_end(name)
+        return room
+
+    def get(self, name: str) -> Optional[RoomState]:
+        self._expire()
+        return self.rooms.get(name)
+
+    def join(self, name: str, identity: str):
+        room = self.rooms.get(name)
+        if room is None:
+            room = self.rooms[name] = RoomState(name)
+        self.unjoined.pop(name, None)
+        participant = room.participants.get(identity)
+        if participant is None:
+            participant = room.participants[identity] = Participant(identity)
+        participant.connections += 1
+
+    def leave(self, name: str, identity: str):
+        room = self.rooms.get(name)
+        participant = room.participants.get(identity) if room else None
+        if participant is None:
+            return
+        participant.connections -= 1
+        if participant.connections <= 0:
+            del room.participants[identity]
+            if not room.participants:
+                del self.rooms[name]
+
+    def occupancy(self, name: str) -> int:
+        room = self.rooms.get(name)
+        return room.num_participants if room else 0
+
+    def live_rooms(self) -> List[RoomState]:
+        self._expire()
+        return [room for room in self.rooms.values() if room.participants]
+
+room_state = RoomStateStore()
@@ -0,0 +1,138 @@
+import asyncio
+import difflib
+import re
+import time
+from typing import Dict, List, Optional
+
+from services.metrics import metrics
+
+def _words(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9']+", text.lower())
+
+def answer_similarity(a: str, b: str) -> float:
+    return difflib.SequenceMatcher(None, _words(a), _words(b)).ratio()
+
+class SpeculativeTurn:
+    def __init__(self, context):
+        self.context = context  # what the next generate_question call will build on
+        self.finals: List[str] = []
+        self.partial = ""
+        self.speech_ended_at: Optional[float] = None
+        self.answer: Optional[str] = None  # answer text the running/finished speculation used
+        self.task: Optional[asyncio.Task] = None
+        self.speculated_words = 0
+        self.speculated_at = 0.0
+
+    def answer_so_far(self) -> str:
+        return " ".join(self.finals + ([self.partial] if self.partial else []))
+
+    def cancel(self):
+        if self.task and not self.task.done():
+            self.task.cancel()
+
+class QuestionSpeculator:
+    """Generates the next interview question while the candidate is still answering.
+
+    Live transcripts for a room are accumulated into the answer so far; every
+    time it has grown by min_new_words (and no speculation is already running
+    for the room, since they share the LLM) a question is generated for that
+    partial answer. When the real request arrives at the end of the turn, the
+    speculation is used if its answer is close enough to the final one,
+    otherwise it is discarded and the caller generates as usual.
+    """
+
+    def __init__(self, generate, enabled: bool = True, min_new_words: int = 8, min_interval: float = 1.5,
+                 match_threshold: float = 0.85, on_ready=None):
+        self.generate = generate  # coroutine function: (context, answer) -> result
+        self.enabled = enabled
+        self.min_new_words = min_new_words
+        self.min_interval = min_interval
+        self.match_threshold = match_threshold
+        self.on_ready = on_ready  # optional coroutine function called with each speculative result
+        self.turns: Dict[str, SpeculativeTurn] = {}
+
+    def begin_turn(self, room: str, context):
+        previous = self.turns.pop(room, None)
+        if previous:
+            previous.cancel()
+        if self.enabled:
+            self.turns[room] = SpeculativeTurn(context)
+
+    def end_room(self, room: str):
+        turn = self.turns.pop(room, None)
+        if turn:
+            turn.cancel()
+
+    def on_transcript(self, room: str, message: dict):
+        turn = self.turns.get(room)
+        if turn is None:
+            return
+        kind = message.get("type")
+        if kind == "final" and message.get("text"):
+            turn.finals.append(message["text"])
+            turn.partial = ""
+            turn.speech_ended_at = time.monotonic()
+        elif kind == "partial":
+            turn.partial = message.get("partial", "")
+        else:
+            return
+        # A final transcript may be the end of the answer: speculate on it right away
+        self._maybe_speculate(turn, force=kind == "final")
+
+    def speech_ended_at(self, room: str) -> Optional[float]:
+        turn = self.turns.get(room)
+        return turn.speech_ended_at if turn else None
+
+    async def take(self, room: str, answer: str):
+        """The speculative result for this final answer, or None."""
+        turn = self.turns.get(room)
+        if turn is None or turn.task is None:
+            metrics.incr("speculation.misses")
+            return None
+        if answer_similarity(turn.answer, answer) < self.match_threshold:
+            turn.cancel()  # stale; free the LLM for the real request
+            metrics.incr("speculation.misses")
+            return None
+        try:
+            result = await turn.task
+        except (Exception, asyncio.CancelledError):
+            metrics.incr("speculation.misses")
+            return None
+        metrics.incr("speculation.hits")
+        return result
+
+    def _maybe_speculate(self, turn: SpeculativeTurn, force: bool = False):
+        answer = turn.answer_so_far()
+        words = len(_words(answer))
+        now = time.monotonic()
+        if turn.task and not turn.task.done():
+            return
+        if answer == turn.answer or not words:
+            return
+        if not force and (words - turn.speculated_words < self.min_new_words or now - turn.speculated_at < self.min_interval):
+            return
+        turn.answer = answer
+        turn.speculated_words = words
+        turn.speculated_at = now
+        turn.task = asyncio.create_task(self._speculate(turn.context, answer))
+        turn.task.add_done_callback(lambda task: self._on_done(turn, task))
+        metrics.incr("speculation.started")
+
+    def _on_done(self, turn: SpeculativeTurn, task: asyncio.Task):
+        if task.cancelled():
+            return
+        # Retrieve the error here; take() may never await this task
+        error = task.exception()
+        if error is not None:
+            metrics.incr("speculation.failed")
+            print(f"Speculative question failed: {str(error)}")
+        # The answer was finalized while the LLM was busy; catch up with it
+        if turn.finals:
+            self._maybe_speculate(turn, force=not turn.partial)
+
+    async def _speculate(self, context, answer: str):
+        result = await self.generate(context, answer)
+        if self.on_ready:
+            # e.g. synthesize the question's audio before it is needed
+            asyncio.create_task(self.on_ready(result))
+        return result
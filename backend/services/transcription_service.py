@@ -0,0 +1,123 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from services.audio_decoder import decode_audio_bytes
+from services.metrics import metrics
+
+class TranscriptionJob:
+    def __init__(self, audio: bytes, filename: Optional[str] = None):
+        self.id = uuid.uuid4().hex
+        self.audio = audio
+        self.filename = filename
+        self.status = "queued"  # "queued", "running", "completed", "failed"
+        self.result: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.cache_key: Optional[str] = None
+        self.cached = False
+        self.done = asyncio.Event()
+
+    def finish(self, status: str):
+        self.status = status
+        self.audio = b""
+        self.finished_at = time.time()
+        self.done.set()
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "filename": self.filename,
+            "result": self.result,
+            "error": self.error,
+            "cached": self.cached,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+class TranscriptionService:
+    """Queue of transcription jobs served by a fixed number of workers.
+
+    Requests never run inference on the event loop: uploads are decoded from
+    memory on a small thread pool and transcribed through the Whisper batcher.
+    When more jobs arrive than there are workers they wait in the queue, so a
+    burst of uploads delays other uploads but not the rest of the API.
+
+    With a cache, an upload whose bytes were transcribed before (with the
+    same model and options) completes immediately without decoding. Hashing
+    and cache reads/writes (SQLite) run on their own thread, so a cache hit
+    never waits behind a long decode and never blocks the event loop.
+    """
+
+    def __init__(self, get_batcher, workers: int = 2, max_finished: int = 500, cache=None,
+                 model_name: str = "", options: Optional[dict] = None):
+        self.get_batcher = get_batcher  # coroutine function; the model may load lazily
+        self.cache = cache
+        self.model_name = model_name
+        self.options = options or {}
+        self.workers = workers
+        self.max_finished = max_finished
+        self.jobs: "OrderedDict[str, TranscriptionJob]" = OrderedDict()
+        self.decode_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stt-decode")
+        self.cache_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stt-cache")
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+
+    async def submit(self, audio: bytes, filename: Optional[str] = None) -> TranscriptionJob:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        job = TranscriptionJob(audio, filename)
+        self.jobs[job.id] = job
+        if self.cache is not None:
+            cached = await asyncio.get_running_loop().run_in_executor(self.cache_pool, self._lookup, job)
+            metrics.incr("stt.cache_hits" if cached is not None else "stt.cache_misses")
+            if cached is not None:
+                job.result = cached
+                job.cached = True
+                job.finish("completed")
+                self._evict_finished()
+                return job
+        self._queue.put_nowait(job)
+        metrics.set_gauge("stt.queue_depth", self._queue.qsize())
+        self._evict_finished()
+        return job
+
+    def get(self, job_id: str) -> Optional[TranscriptionJob]:
+        return self.jobs.get(job_id)
+
+    def _lookup(self, job: TranscriptionJob) -> Optional[dict]:
+        # Runs on cache_pool
+        job.cache_key = self.cache.make_key(job.audio, self.model_name, self.options)
+        return self.cache.get(job.cache_key)
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._queue.get()
+            metrics.set_gauge("stt.queue_depth", self._queue.qsize())
+            job.status = "running"
+            start = time.perf_counter()
+            try:
+                audio = await loop.run_in_executor(self.decode_pool, decode_audio_bytes, job.audio)
+                batcher = await self.get_batcher()
+                job.result = await batcher.transcribe(audio)
+                if job.cache_key:
+                    await loop.run_in_executor(self.cache_pool, self.cache.put, job.cache_key, job.result)
+                status = "completed"
+            except Exception as e:
+                job.error = str(e)
+                status = "failed"
+            metrics.observe("stt.job", time.perf_counter() - start)
+            job.finish(status)
+
+    def _evict_finished(self):
+        # Keep the most recent finished jobs around for polling
+        finished = [job_id for job_id, job in self.jobs.items() if job.done.is_set()]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self.jobs[job_id]
@@ -0,0 +1,155 @@
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Optional, Set
+
+# Bump when the stored audio changes (e.g. normalization) so old entries stop matching
+AUDIO_VERSION = 2
+
+def normalize_text(text: str) -> str:
+    # Same words, same audio: ignore unicode variants and whitespace differences
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip()
+
+class TTSCache:
+    """Two-tier cache of synthesized PCM keyed by normalized text and voice.
+
+    Recently used audio is held in memory (LRU, bounded by max_memory_bytes);
+    it is also written to disk_dir so it survives restarts and is shared by
+    workers on the same machine. The disk tier is an LRU too, bounded by
+    max_disk_bytes, except for pinned keys (the prewarmed prompts). get and
+    put do file I/O, so call them from an executor.
+    """
+
+    def __init__(self, disk_dir: str = "tts_cache", max_memory_bytes: int = 64 * 1024 * 1024,
+                 max_disk_bytes: int = 512 * 1024 * 1024):
+        self.disk_dir = disk_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self.memory_bytes = 0
+        # key -> file size, least recently used first
+        self.disk: "OrderedDict[str, int]" = OrderedDict()
+        self.disk_bytes = 0
+        self.pinned: Set[str] = set()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(disk_dir, exist_ok=True)
+        self._load_disk_index()
+
+    @staticmethod
+    def make_key(text: str, voice: str) -> str:
+        return hashlib.sha256(f"{voice}\0{AUDIO_VERSION}\0{normalize_text(text)}".encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            pcm = self.memory.get(key)
+            if pcm is not None:
+                self.memory.move_to_end(key)
+                if key in self.disk:
+                    self.disk.move_to_end(key)
+                self.memory_hits += 1
+                return pcm
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                pcm = f.read()
+        except FileNotFoundError:
+            # Possibly evicted by another worker
+            with self._lock:
+                self.misses += 1
+                if key in self.disk:
+                    self.disk_bytes -= self.disk.pop(key)
+            return None
+        with self._lock:
+            self.disk_hits += 1
+            self._index(key, len(pcm))
+        try:
+            os.utime(path)  # recency for the other workers' next index load
+        except OSError:
+            pass
+        self._remember(key, pcm)
+        return pcm
+
+    def put(self, key: str, pcm: bytes):
+        # Write-then-rename so a concurrent reader never sees a partial file
+        path = self._path(key)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(pcm)
+        os.replace(temp_path, path)
+        with self._lock:
+            self._index(key, len(pcm))
+            evicted = self._evict_disk()
+        for old_key in evicted:
+            try:
+                os.remove(self._path(old_key))
+            except FileNotFoundError:
+                pass
+        self._remember(key, pcm)
+
+    def pin(self, key: str):
+        # Never evicted from disk, e.g. the prewarmed prompts
+        with self._lock:
+            self.pinned.add(key)
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+            "memory_entries": len(self.memory),
+            "memory_bytes": self.memory_bytes,
+            "disk_entries": len(self.disk),
+            "disk_bytes": self.disk_bytes,
+            "pinned": len(self.pinned),
+        }
+
+    def _load_disk_index(self):
+        # Oldest first, so eviction after a restart still follows last use
+        entries = []
+        for name in os.listdir(self.disk_dir):
+            if not name.endswith(".pcm"):
+                continue
+            stat = os.stat(os.path.join(self.disk_dir, name))
+            entries.append((stat.st_mtime, name[:-len(".pcm")], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._index(key, size)
+
+    def _index(self, key: str, size: int):
+        if key in self.disk:
+            self.disk_bytes -= self.disk.pop(key)
+        self.disk[key] = size
+        self.disk_bytes += size
+
+    def _evict_disk(self):
+        evicted = []
+        if self.disk_bytes <= self.max_disk_bytes:
+            return evicted
+        for key in list(self.disk):
+            if self.disk_bytes <= self.max_disk_bytes:
+                break
+            if key in self.pinned:
+                continue
+            self.disk_bytes -= self.disk.pop(key)
+            evicted.append(key)
+        return evicted
+
+    def _remember(self, key: str, pcm: bytes):
+        with self._lock:
+            if key in self.memory:
+                self.memory_bytes -= len(self.memory.pop(key))
+            self.memory[key] = pcm
+            self.memory_bytes += len(pcm)
+            while self.memory_bytes > self.max_memory_bytes and len(self.memory) > 1:
+                _, evicted = self.memory.popitem(last=False)
+                self.memory_bytes -= len(evicted)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.pcm")
@@ -0,0 +1,25 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+class TTSEngine:
+    """Coqui TTS behind an async interface; synthesis runs on its own threads."""
+
+    def __init__(self, tts, workers: int = 1):
+        self.tts = tts
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tts")
+
+    async def synthesize(self, text: str) -> bytes:
+        """Synthesize one sentence to 16-bit mono PCM."""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self._synthesize, text)
+
+    async def sample_rate(self) -> int:
+        return self.tts.synthesizer.output_sample_rate
+
+    def _synthesize(self, text: str) -> bytes:
+        wav = np.asarray(self.tts.tts(text=text), dtype=np.float32)
+        # Peak-normalize like Coqui's save_wav (what tts_to_file wrote), so
+        # cached and streamed audio is as loud as the original endpoint's
+        peak = max(0.01, float(np.max(np.abs(wav)))) if wav.size else 1.0
+        return (wav * (32767 / peak)).astype(np.int16).tobytes()
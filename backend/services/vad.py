@@ -0,0 +1,126 @@
+import numpy as np
+from collections import deque
+from numpy.lib.stride_tricks import as_strided
+from typing import List, Optional, Tuple
+
+class VoiceActivityDetector:
+    """Frame-level energy + zero-crossing-rate VAD for one 16-bit mono PCM stream.
+
+    Audio is analysed in overlapping windows (window_ms long, every hop_ms)
+    built as strided views, so each call is a handful of vectorized NumPy ops
+    regardless of how much audio is passed in. Each stream keeps its own
+    adaptive noise floor, a hangover so word endings and short pauses are not
+    clipped, and a pre-roll so the onset of speech is not lost either.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = 16000,
+        window_ms: int = 30,
+        hop_ms: int = 10,
+        margin_db: float = 9.0,
+        zcr_threshold: float = 0.25,
+        hangover_ms: int = 300,
+        preroll_ms: int = 150,
+        floor_adapt: float = 0.05,
+        min_floor_db: float = 20.0
+    ):
+        self.window = sample_rate * window_ms // 1000
+        self.hop = sample_rate * hop_ms // 1000
+        self.margin_db = margin_db
+        self.zcr_threshold = zcr_threshold
+        self.hangover_frames = hangover_ms // hop_ms
+        self.floor_adapt = floor_adapt
+        self.min_floor_db = min_floor_db
+        self.noise_floor_db: Optional[float] = None
+
+        self._tail = np.zeros(0, dtype=np.int16)
+        self._frames_since_speech = 10 ** 6
+        self._was_active = False
+        self._preroll = deque(maxlen=preroll_ms // hop_ms)
+
+    def process(self, pcm: bytes) -> List[Tuple[bytes, bool]]:
+        """Return the speech PCM to forward as (pcm, ends_utterance) pieces, in order.
+
+        A chunk can hold several utterances (frames may be longer than the
+        hangover), so the speech is split at every end of speech inside it;
+        each piece but possibly the last ends an utterance.
+        """
+        samples = np.frombuffer(pcm[:len(pcm) - len(pcm) % 2], dtype=np.int16)
+        if self._tail.size:
+            samples = np.concatenate((self._tail, samples))
+        n = (samples.size - self.window) // self.hop + 1
+        if n <= 0:
+            self._tail = samples.copy()
+            return []
+
+        step = samples.strides[0]
+        windows = as_strided(samples, shape=(n, self.window), strides=(step * self.hop, step), writeable=False)
+        hops = samples[:n * self.hop].reshape(n, self.hop)
+        self._tail = samples[n * self.hop:].copy()
+
+        active = self._classify(windows)
+
+        # Pre-roll: emit the hops leading up to each speech onset
+        emit = active.copy()
+        previous = np.concatenate(([self._was_active], active[:-1]))
+        onsets = np.flatnonzero(active & ~previous)
+        for onset in onsets:
+            emit[max(0, onset - self._preroll.maxlen):onset] = True
+        out = b""
+        if onsets.size and not self._was_active and onsets[0] < self._preroll.maxlen:
+            keep = self._preroll.maxlen - onsets[0]
+            out = b"".join(list(self._preroll)[-keep:]) if keep else b""
+
+        # Split at every active -> inactive transition, not just at the chunk edge
+        pieces = []
+        start = 0
+        for end in np.flatnonzero(previous & ~active):
+            pieces.append((out + hops[start:end][emit[start:end]].tobytes(), True))
+            out = b""
+            start = end
+        rest = out + hops[start:][emit[start:]].tobytes()
+        if rest:
+            pieces.append((rest, False))
+
+        # Remember trailing silence in case speech starts at the top of the next chunk
+        if active.any():
+            self._preroll.clear()
+        if not active[-1]:
+            quiet = n - 1 - np.flatnonzero(active)[-1] if active.any() else n
+            for hop in hops[n - min(quiet, self._preroll.maxlen):]:
+                self._preroll.append(hop.tobytes())
+
+        self._was_active = bool(active[-1])
+        return pieces
+
+    def _classify(self, windows: np.ndarray) -> np.ndarray:
+        x = windows.astype(np.float32)
+        energy_db = 10.0 * np.log10(np.mean(x * x, axis=1) + 1e-6)
+        signs = np.signbit(windows)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (self.window - 1)
+
+        if self.noise_floor_db is None:
+            self.noise_floor_db = max(float(np.percentile(energy_db, 10)), self.min_floor_db)
+        floor = self.noise_floor_db
+
+        # Voiced speech is loud; unvoiced fricatives are quieter but cross zero a lot
+        speech = (energy_db > floor + self.margin_db) | (
+            (energy_db > floor + self.margin_db / 2) & (zcr > self.zcr_threshold)
+        )
+
+        # Track the noise floor from non-speech frames; drop quickly, rise slowly
+        noise = energy_db[~speech]
+        if noise.size:
+            level = float(np.mean(noise))
+            if level < floor:
+                floor = level
+            else:
+                floor += self.floor_adapt * (level - floor)
+            self.noise_floor_db = max(floor, self.min_floor_db)
+
+        # Hangover: stay active for hangover_frames after the last speech frame
+        idx = np.arange(speech.size)
+        last_speech = np.maximum.accumulate(np.where(speech, idx, -self._frames_since_speech - 1))
+        self._frames_since_speech = int(speech.size - 1 - last_speech[-1])
+        return (idx - last_speech) <= self.hangover_frames
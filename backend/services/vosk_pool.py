@@ -0,0 +1,241 @@
+import asyncio
+import itertools
+import json
+import os
+import struct
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+import websockets
+
+from services.metrics import metrics
+
+# Comma-separated recognizer endpoints; sessions are balanced across all of them
+VOSK_SERVERS = [url.strip() for url in os.getenv("VOSK_SERVERS", "ws://localhost:2700").split(",") if url.strip()]
+CONNECTIONS_PER_SERVER = int(os.getenv("VOSK_CONNECTIONS_PER_SERVER", "2"))
+SESSION_MESSAGE_QUEUE = 64
+RECONNECT_INTERVAL = 5.0  # seconds between reconnect attempts to a server that is down
+WELCOME_TIMEOUT = 5.0
+
+# Binary frames on a multiplexed connection are a 4-byte session id followed by PCM
+SESSION_HEADER = struct.Struct("!I")
+
+class VoskSession:
+    """One audio stream's recognizer, multiplexed over a shared connection.
+
+    send_audio spends one frame of credit and waits when there is none, so
+    a recognizer that falls behind pushes back on this stream alone (and the
+    room's FrameQueue applies its overflow policy) instead of the server
+    dropping audio.
+    """
+
+    def __init__(self, session_id: int, connection: "VoskConnection"):
+        self.session_id = session_id
+        self.connection = connection
+        self.messages = deque()  # (message, is_partial)
+        self._ready = asyncio.Event()
+        self.credits = connection.credit_window  # None: server without flow control
+        self._credit = asyncio.Event()
+        self.closed = False
+
+    async def send_audio(self, pcm: bytes):
+        if self.credits is not None:
+            while self.credits <= 0:
+                if not self.connection.alive:
+                    raise ConnectionError(f"Vosk connection to {self.connection.url} lost")
+                self._credit.clear()
+                await self._credit.wait()
+            self.credits -= 1
+        await self.connection.ws.send(SESSION_HEADER.pack(self.session_id) + pcm)
+
+    def grant(self, frames: int):
+        self.credits += frames
+        self._credit.set()
+
+    async def end_of_speech(self):
+        await self.connection.send_control("end_of_speech", self.session_id)
+
+    async def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.connection.sessions.pop(self.session_id, None)
+        try:
+            await self.connection.send_control("close", self.session_id)
+        except Exception:
+            pass
+
+    def deliver(self, message: Optional[str], partial: bool = False):
+        # Transcripts are small and the client reads them promptly; if one
+        # session stops reading, drop its oldest partial rather than stalling
+        # every other session on the connection. Finals and the end-of-stream
+        # marker are never dropped (each partial is superseded anyway).
+        if len(self.messages) >= SESSION_MESSAGE_QUEUE:
+            for index, (_, queued_partial) in enumerate(self.messages):
+                if queued_partial:
+                    del self.messages[index]
+                    break
+            else:
+                if partial:
+                    return
+        self.messages.append((message, partial))
+        self._ready.set()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> str:
+        while not self.messages:
+            self._ready.clear()
+            await self._ready.wait()
+        message, _ = self.messages.popleft()
+        if message is None:
+            raise StopAsyncIteration
+        return message
+
+class VoskConnection:
+    """A warm WebSocket to one recognizer server carrying many sessions."""
+
+    def __init__(self, url: str, ws, credit_window: Optional[int] = None):
+        self.url = url
+        self.ws = ws
+        self.credit_window = credit_window
+        self.sessions: Dict[int, VoskSession] = {}
+        self.lost = False
+        self.reader = asyncio.create_task(self._read_loop())
+
+    @property
+    def alive(self) -> bool:
+        return not self.lost and not self.reader.done()
+
+    async def send_control(self, kind: str, session_id: int):
+        await self.ws.send(json.dumps({"type": kind, "session": session_id}))
+
+    async def _read_loop(self):
+        try:
+            async for message in self.ws:
+                try:
+                    data = json.loads(message)
+                    session_id = data.get("session")
+                except (json.JSONDecodeError, AttributeError):
+                    continue
+                session = self.sessions.get(session_id)
+                if not session:
+                    continue
+                kind = data.get("type")
+                if kind == "credit":
+                    session.grant(data.get("frames", 0))
+                elif kind == "overload":
+                    # Only happens if credit was not honoured; not for the browser
+                    metrics.incr("vosk.server_overload")
+                    print(f"Vosk server {self.url} dropped audio for session {session_id}")
+                else:
+                    session.deliver(message, partial=kind == "partial")
+        except Exception as e:
+            print(f"Vosk connection to {self.url} lost: {str(e)}")
+        finally:
+            self.lost = True
+            # End every session's transcript stream so its audio_stream notices,
+            # and wake senders waiting for credit
+            for session in list(self.sessions.values()):
+                session.deliver(None)
+                session._credit.set()
+            self.sessions.clear()
+
+class VoskConnectionPool:
+    """Keeps a few warm, multiplexed connections per recognizer server.
+
+    Opening a session is a single control message on an existing connection,
+    so there is no TCP/WebSocket handshake on the hot path and the server-side
+    recognizer is created while the first audio is still being decoded.
+    Missing connections are redialled by a background task; open_session
+    only waits for it when no server is reachable at all.
+    """
+
+    def __init__(self, servers: List[str], connections_per_server: int):
+        self.servers = servers
+        self.connections_per_server = connections_per_server
+        self.connections: List[VoskConnection] = []
+        self._session_ids = itertools.count(1)
+        self._last_attempt: Dict[str, float] = {}
+        self._filler: Optional[asyncio.Task] = None
+        self._connected: Optional[asyncio.Event] = None  # set on each new connection
+
+    async def start(self):
+        """Warm up connections; recognizers that are down are retried on demand."""
+        await self._refill(force=True)
+
+    async def open_session(self, max_retries: int = 3, retry_delay: float = 1.0) -> VoskSession:
+        for attempt in range(max_retries):
+            self.connections = [conn for conn in self.connections if conn.alive]
+            if len(self.connections) < len(self.servers) * self.connections_per_server:
+                filler = self._refill(force=not self.connections)
+                if not self.connections:
+                    # Nothing to fall back on: wait for the first server to answer
+                    # (or the round to end), not for every unreachable one
+                    self._connected = asyncio.Event()
+                    connected = asyncio.create_task(self._connected.wait())
+                    await asyncio.wait({filler, connected}, return_when=asyncio.FIRST_COMPLETED)
+                    connected.cancel()
+            if self.connections:
+                # Least-loaded connection across all servers
+                connection = min(self.connections, key=lambda conn: len(conn.sessions))
+                session = VoskSession(next(self._session_ids), connection)
+                connection.sessions[session.session_id] = session
+                await connection.send_control("open", session.session_id)
+                return session
+            if attempt < max_retries - 1:
+                print(f"No Vosk server reachable (attempt {attempt + 1}), retrying")
+                await asyncio.sleep(retry_delay)
+        raise Exception(f"Failed to connect to any Vosk server after {max_retries} attempts")
+
+    def stats(self) -> list:
+        return [
+            {"server": conn.url, "alive": conn.alive, "sessions": len(conn.sessions)}
+            for conn in self.connections
+        ]
+
+    def _refill(self, force: bool = False) -> asyncio.Task:
+        # At most one dialling round at a time, shared by every caller
+        if self._filler is None or self._filler.done():
+            self._filler = asyncio.create_task(self._fill(force))
+        return self._filler
+
+    async def _fill(self, force: bool = False):
+        now = time.monotonic()
+        dials = []
+        for url in self.servers:
+            live = sum(1 for conn in self.connections if conn.url == url and conn.alive)
+            if live >= self.connections_per_server:
+                continue
+            # Don't redial a dead server more often than RECONNECT_INTERVAL
+            if not force and now - self._last_attempt.get(url, float("-inf")) < RECONNECT_INTERVAL:
+                continue
+            self._last_attempt[url] = now
+            dials.append(self._fill_server(url, self.connections_per_server - live))
+        # Servers are dialled in parallel, so one unreachable host delays nobody else
+        await asyncio.gather(*dials)
+
+    async def _fill_server(self, url: str, missing: int):
+        for _ in range(missing):
+            try:
+                self.connections.append(await self._connect(url))
+                if self._connected is not None:
+                    self._connected.set()
+            except Exception as e:
+                print(f"Failed to connect to Vosk server {url}: {str(e)}")
+                break
+
+    async def _connect(self, url: str) -> VoskConnection:
+        ws = await websockets.connect(url, max_size=2**24)
+        try:
+            # The welcome message says whether the server does credit flow control
+            welcome = json.loads(await asyncio.wait_for(ws.recv(), WELCOME_TIMEOUT))
+        except Exception:
+            await ws.close()
+            raise
+        credit_window = welcome.get("credit_window") if isinstance(welcome, dict) else None
+        return VoskConnection(url, ws, credit_window)
+
+vosk_pool = VoskConnectionPool(VOSK_SERVERS, CONNECTIONS_PER_SERVER)
@@ -0,0 +1,139 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import numpy as np
+import torch
+import whisper
+from whisper.audio import N_SAMPLES, SAMPLE_RATE
+from whisper.tokenizer import get_tokenizer
+
+from services.metrics import metrics
+
+TIME_PRECISION = 0.02  # seconds per Whisper timestamp token
+
+class WhisperBatcher:
+    """Micro-batches Whisper decoding across concurrent callers.
+
+    Callers submit audio of up to 30 s (the model's input window). The
+    scheduler waits up to window_ms after the first pending window for others
+    to arrive, pads them with silence to 30 s, stacks them and runs one
+    encoder/decoder pass for the whole batch on a dedicated inference thread,
+    then hands each caller back its own result.
+
+    Longer audio (uploads) is not cut at fixed 30 s boundaries, which would
+    lose words at every cut; it goes through model.transcribe on the same
+    thread, which seeks on timestamps and has temperature fallback and
+    previous-text conditioning.
+    """
+
+    def __init__(self, model, window_ms: int = 50, max_batch: int = 8):
+        self.model = model
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.tokenizer = get_tokenizer(model.is_multilingual, num_languages=model.num_languages, task="transcribe")
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="whisper-batch")
+        self._pending: List[tuple] = []  # (audio window, future)
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    async def transcribe(self, audio: np.ndarray) -> dict:
+        """Transcribe float32 16 kHz mono audio, returning text and timed segments."""
+        if not audio.size:
+            return {"text": "", "segments": [], "language": None}
+        if audio.size > N_SAMPLES:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, self._transcribe_long, audio)
+        result = await self._submit(audio)
+        segments = self._split_segments(result.tokens, 0.0, audio.size / SAMPLE_RATE)
+        for index, segment in enumerate(segments):
+            segment["id"] = index
+        return {
+            "text": result.text.strip(),
+            "segments": segments,
+            "language": result.language,
+        }
+
+    def _transcribe_long(self, audio: np.ndarray) -> dict:
+        # Runs on the inference thread, between batches
+        start = time.perf_counter()
+        result = self.model.transcribe(audio, fp16=self.model.device.type == "cuda")
+        metrics.observe("whisper.long_transcribe", time.perf_counter() - start)
+        return {
+            "text": result["text"].strip(),
+            "segments": [
+                {"id": segment["id"], "start": round(segment["start"], 2), "end": round(segment["end"], 2),
+                 "text": segment["text"]}
+                for segment in result["segments"]
+            ],
+            "language": result.get("language"),
+        }
+
+    async def _submit(self, audio: np.ndarray):
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((audio, future))
+        self._wakeup.set()
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            # Give other sessions a moment to join this batch
+            if len(self._pending) < self.max_batch:
+                await asyncio.sleep(self.window)
+            while self._pending:
+                batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+                try:
+                    results = await loop.run_in_executor(self.executor, self._decode, [audio for audio, _ in batch])
+                except Exception as e:
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                for (_, future), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+
+    def _decode(self, windows: List[np.ndarray]):
+        # Runs on the inference thread
+        start = time.perf_counter()
+        # Pad the audio with silence, not the mel with zeros: zero mel frames
+        # are off-distribution and invite hallucinated text
+        mels = [
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(window), self.model.dims.n_mels)
+            for window in windows
+        ]
+        batch = torch.stack(mels).to(self.model.device)
+        options = whisper.DecodingOptions(fp16=self.model.device.type == "cuda", without_timestamps=False)
+        results = whisper.decode(self.model, batch, options)
+        metrics.observe("whisper.batch_decode", time.perf_counter() - start)
+        metrics.incr("whisper.batches")
+        metrics.incr("whisper.batched_windows", len(windows))
+        return results
+
+    def _split_segments(self, tokens: List[int], offset: float, duration: float) -> List[dict]:
+        # Timestamp tokens come in pairs around each segment: <|t0|> text <|t1|>
+        begin = self.tokenizer.timestamp_begin
+        segments = []
+        start = 0.0
+        text_tokens = []
+        for token in tokens:
+            if token >= begin:
+                timestamp = (token - begin) * TIME_PRECISION
+                if text_tokens:
+                    segments.append(self._segment(text_tokens, offset + start, offset + timestamp))
+                    text_tokens = []
+                start = timestamp
+            elif token < self.tokenizer.eot:
+                text_tokens.append(token)
+        if text_tokens:
+            segments.append(self._segment(text_tokens, offset + start, offset + duration))
+        return segments
+
+    def _segment(self, text_tokens: List[int], start: float, end: float) -> dict:
+        return {"start": round(start, 2), "end": round(end, 2), "text": self.tokenizer.decode(text_tokens)}
@@ -0,0 +1,71 @@
+import json
+from typing import Dict, Union
+
+try:
+    import msgpack
+except ImportError:  # optional; only needed for ?format=msgpack clients
+    msgpack = None
+
+PONG = {"type": "pong", "message": "pong", "sender": "system"}
+
+class JsonCodec:
+    name = "json"
+    binary = False
+
+    def __init__(self):
+        self.pong = self.encode(PONG)
+
+    def encode(self, payload: dict) -> str:
+        return json.dumps(payload)
+
+    def decode(self, raw: str):
+        return json.loads(raw)
+
+class MsgpackCodec:
+    """Binary frames: smaller and cheaper to (de)serialize than JSON."""
+
+    name = "msgpack"
+    binary = True
+
+    def __init__(self):
+        self.pong = self.encode(PONG)
+
+    def encode(self, payload: dict) -> bytes:
+        return msgpack.packb(payload)
+
+    def decode(self, raw: bytes):
+        return msgpack.unpackb(raw)
+
+JSON_CODEC = JsonCodec()
+CODECS: Dict[str, Union[JsonCodec, MsgpackCodec]] = {"json": JSON_CODEC}
+if msgpack is not None:
+    CODECS["msgpack"] = MsgpackCodec()
+
+def get_codec(name: str):
+    codec = CODECS.get(name)
+    if codec is None:
+        raise ValueError(f"Unsupported message format '{name}' (available: {', '.join(CODECS)})")
+    return codec
+
+def decode_frame(message: dict):
+    """Decode an ASGI websocket.receive message into a dict.
+
+    Text frames are JSON (plain text is accepted as a chat message without
+    going through the JSON parser); binary frames are msgpack.
+    """
+    text = message.get("text")
+    if text is not None:
+        if not text.startswith(("{", '"')):
+            return {"message": text}
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError:
+            return {"message": text}
+        if isinstance(data, str):
+            return {"message": data}
+        return data if isinstance(data, dict) else {"message": text}
+    raw = message.get("bytes")
+    if raw is None or msgpack is None:
+        raise ValueError("Binary frames need msgpack")
+    data = msgpack.unpackb(raw)
+    return data if isinstance(data, dict) else {"message": data}
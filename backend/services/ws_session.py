@@ -0,0 +1,89 @@
+import logging
+import os
+
+from fastapi import WebSocket
+
+from services.connection_registry import ConnectionRegistry
+from services.ws_codec import decode_frame, get_codec
+
+logger = logging.getLogger("ws")
+
+# Per-message logs are DEBUG only, and then only every Nth message
+LOG_SAMPLE_EVERY = max(1, int(os.getenv("WS_LOG_SAMPLE_EVERY", "100")))
+
+class SampledLogger:
+    def __init__(self, every: int):
+        self.every = every
+        self.count = 0
+
+    def debug(self, msg: str, *args):
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
+        self.count += 1
+        if self.count % self.every == 0:
+            logger.debug(msg, *args)
+
+message_log = SampledLogger(LOG_SAMPLE_EVERY)
+
+async def run_chat_session(websocket: WebSocket, registry: ConnectionRegistry, room_name: str, identity: str,
+                           message_format: str = "json"):
+    """Serve one chat participant: join the room, relay messages, leave.
+
+    Shared by every chat endpoint. Liveness is handled by protocol-level
+    websocket pings from the server (uvicorn ws_ping_interval); app-level
+    {"type": "ping"} messages from older clients get a pre-encoded pong and
+    are never broadcast.
+    """
+    try:
+        codec = get_codec(message_format)
+    except ValueError as e:
+        await websocket.close(code=1003, reason=str(e))
+        return
+    await websocket.accept()
+    connection_id = await registry.connect(websocket, room_name, identity, codec)
+    logger.info("Chat connection %s joined (%s)", connection_id, codec.name)
+    registry.send(connection_id, {
+        "type": "system",
+        "message": f"Welcome to room {room_name}!",
+        "sender": "system"
+    })
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            message_log.debug("Received from %s: %r", connection_id, message.get("text") or message.get("bytes"))
+            try:
+                data = decode_frame(message)
+                kind = data.get("type")
+                if kind == "ping":
+                    registry.send_pong(connection_id)
+                elif kind == "init":
+                    registry.send(connection_id, {
+                        "type": "system",
+                        "message": "Connection initialized successfully",
+                        "sender": "system"
+                    })
+                else:
+                    # No "message" key: relay the raw frame, as before
+                    text = data.get("message", message.get("text", data))
+                    await registry.broadcast_to_room(room_name, text, identity, connection_id)
+            except Exception as e:
+                logger.warning("Error processing message from %s: %s", connection_id, e)
+                if not registry.send(connection_id, {
+                    "type": "error",
+                    "message": f"Error processing message: {str(e)}",
+                    "sender": "system"
+                }):
+                    break
+    except Exception as e:
+        logger.warning("Chat connection %s failed: %s", connection_id, e)
+    finally:
+        logger.info("Chat connection %s left", connection_id)
+        registry.disconnect(connection_id, websocket)
+        # Unless a reconnect of the same identity replaced us, tell the room
+        if registry.get(connection_id) is None:
+            try:
+                await registry.broadcast_to_room(room_name, f"{identity} has left the room", "system", connection_id)
+            except Exception as e:
+                logger.warning("Error broadcasting disconnect message: %s", e)
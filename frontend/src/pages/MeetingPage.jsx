@@ -174,8 +174,9 @@ export default function MeetingPage() {
               }
             };
 
-            // Increase chunk size to 2000ms for better Vosk recognition
-            mediaRecorder.start(2000);
+            // Small timeslices keep partial transcripts live; the backend
+            // re-frames the decoded PCM for Vosk
+            mediaRecorder.start(250);
           } catch (error) {
             console.error('Error creating MediaRecorder:', error);
             ws.close();
@@ -365,7 +366,8 @@ export default function MeetingPage() {
         interview_history: conversationHistory.map(msg => ({
           role: msg.role,
           content: msg.content
-        }))
+        })),
+        session_id: roomName
       });
       return response.data.question;
     } catch (error) {
@@ -446,7 +448,13 @@ export default function MeetingPage() {
         candidate_id: candidateId,
         conversation: conversationHistory
       });
-      setEvaluation(response.data.evaluation);
+      let result = response.data;
+      // Still running on the server: poll the evaluation job until it finishes
+      while (response.status === 202 && result.status !== "completed" && result.status !== "failed") {
+        await new Promise(resolve => setTimeout(resolve, 3000));
+        result = (await axios.get(`/api/llm/evaluation_jobs/${response.data.job_id}`)).data;
+      }
+      setEvaluation(result.evaluation || result.error);
       setShowEvaluation(true);
       debugSetBotStatus("completed");
     } catch (error) {
@@ -4,6 +4,10 @@ import json
 import numpy as np
 from vosk import Model, KaldiRecognizer
 import logging
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 
 # Configure logging
 logging.basicConfig(
@@ -22,78 +26,261 @@ except Exception as e:
     logger.error(f"Failed to load Vosk model: {str(e)}")
     raise
 
+# Recognition runs on a pool of worker threads so Kaldi decoding for different
+# clients proceeds in parallel on all cores (vosk releases the GIL while decoding)
+WORKER_COUNT = int(os.getenv("VOSK_WORKERS", os.cpu_count() or 1))
+SESSION_QUEUE_SIZE = int(os.getenv("VOSK_SESSION_QUEUE", "32"))
+
+# Bind address; set VOSK_HOST=0.0.0.0 to serve backends on other machines
+HOST = os.getenv("VOSK_HOST", "localhost")
+PORT = int(os.getenv("VOSK_PORT", "2700"))
+
+# Binary frames on a multiplexed connection are a 4-byte session id followed by PCM
+SESSION_HEADER = struct.Struct("!I")
+
+# Flow control on multiplexed connections: each session may have
+# SESSION_QUEUE_SIZE frames in flight, and gets credit back for every frame
+# decoded ({"type": "credit", "session": id, "frames": n}, batched)
+CREDIT_BATCH = max(1, SESSION_QUEUE_SIZE // 4)
+
+# Queued after audio to ask for the final result of the current utterance
+END_OF_SPEECH = object()
+
+class RecognitionSession:
+    """One client's recognizer, pinned to a single worker thread for its lifetime."""
+
+    def __init__(self, engine, worker: int, send, session_id: Optional[int] = None):
+        self.engine = engine
+        self.worker = worker
+        self.send = send
+        self.session_id = session_id  # set when multiplexed over a shared connection
+        self.rec = KaldiRecognizer(model, 16000)
+        self.rec.SetWords(True)
+        # At most SESSION_QUEUE_SIZE audio frames wait for the worker; control
+        # items (end of speech, close) are always accepted
+        self.queue = asyncio.Queue()
+        self.pending_audio = 0
+        self.dropped = 0
+        self.unacked = 0  # decoded frames not yet returned as credit
+        self._room = asyncio.Event()  # set whenever the worker takes a frame
+        self.task = asyncio.create_task(self._run())
+        self.task.add_done_callback(lambda _: self._room.set())
+
+    async def submit(self, item):
+        # Dedicated connection: wait for room, which stops reading from the
+        # socket and pushes back on the sender
+        while item is not END_OF_SPEECH and self.pending_audio >= SESSION_QUEUE_SIZE and not self.task.done():
+            self._room.clear()
+            await self._room.wait()
+        self.offer(item)
+
+    def offer(self, item) -> bool:
+        """Queue without waiting, for multiplexed connections where waiting
+        would stall every other session. Clients that honour their credit
+        never exceed the limit; audio beyond it is dropped and the client is
+        told once per overload."""
+        if item is not END_OF_SPEECH:
+            if self.pending_audio >= SESSION_QUEUE_SIZE:
+                self.dropped += 1
+                if self.dropped == 1:
+                    logger.warning(f"Session {self.session_id} overloaded, dropping audio")
+                    asyncio.create_task(self._notify_overload())
+                return False
+            self.pending_audio += 1
+            self.dropped = 0
+        self.queue.put_nowait(item)
+        return True
+
+    async def _notify_overload(self):
+        try:
+            await self.send(json.dumps({
+                "type": "overload",
+                "message": "Recognizer is behind; audio is being dropped",
+                "sender": "system",
+                "session": self.session_id
+            }))
+        except Exception:
+            pass
+
+    async def close(self):
+        # Drain what is queued; the sends fail fast if the peer is gone
+        self.queue.put_nowait(None)
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self.engine.release(self.worker)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        executor = self.engine.executors[self.worker]
+        while True:
+            item = await self.queue.get()
+            if item is None:
+                break
+            if item is not END_OF_SPEECH:
+                self.pending_audio -= 1
+                self._room.set()
+            try:
+                message = await loop.run_in_executor(executor, self._process, item)
+                if message:
+                    if self.session_id is not None:
+                        message["session"] = self.session_id
+                    await self.send(json.dumps(message))
+                if item is not END_OF_SPEECH and self.session_id is not None:
+                    await self._return_credit()
+            except websockets.ConnectionClosed:
+                break
+            except Exception as e:
+                logger.error(f"Recognition error: {str(e)}")
+                try:
+                    await self.send(json.dumps({
+                        "type": "error",
+                        "message": f"Processing error: {str(e)}",
+                        "sender": "system",
+                        "session": self.session_id
+                    }))
+                except Exception:
+                    break
+
+    async def _return_credit(self):
+        self.unacked += 1
+        if self.unacked >= CREDIT_BATCH or self.queue.empty():
+            frames, self.unacked = self.unacked, 0
+            await self.send(json.dumps({"type": "credit", "session": self.session_id, "frames": frames}))
+
+    def _process(self, item):
+        # Runs on the session's worker thread
+        if item is END_OF_SPEECH:
+            result = json.loads(self.rec.FinalResult())
+            if result.get("text", "").strip():
+                return {"type": "final", "text": result["text"], "sender": "system"}
+            return None
+        if self.rec.AcceptWaveform(item):
+            result = json.loads(self.rec.Result())
+            if result.get("text", "").strip():
+                return {"type": "final", "text": result["text"], "sender": "system"}
+        else:
+            partial = json.loads(self.rec.PartialResult())
+            if partial.get("partial", "").strip():
+                return {"type": "partial", "partial": partial["partial"], "sender": "system"}
+        return None
+
+class RecognitionEngine:
+    """Shares one Model across sessions and spreads sessions over worker threads."""
+
+    def __init__(self, workers: int):
+        self.executors = [
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"vosk-worker-{i}")
+            for i in range(workers)
+        ]
+        self.sessions_per_worker = [0] * workers
+
+    def open_session(self, send, session_id: Optional[int] = None) -> RecognitionSession:
+        # Session affinity: pick the least loaded worker once and stay on it
+        worker = min(range(len(self.executors)), key=self.sessions_per_worker.__getitem__)
+        self.sessions_per_worker[worker] += 1
+        return RecognitionSession(self, worker, send, session_id)
+
+    def release(self, worker: int):
+        self.sessions_per_worker[worker] -= 1
+
+engine = RecognitionEngine(WORKER_COUNT)
+
 async def recognize(websocket):
+    """Serve one connection.
+
+    A plain client streams raw PCM and gets one recognizer. The backend's
+    connection pool instead multiplexes many sessions over one connection: it
+    sends {"type": "open"/"close"/"end_of_speech", "session": id} control
+    messages and binary frames prefixed with a 4-byte big-endian session id,
+    and every result it gets back carries the session id. Each session starts
+    with credit_window frames of credit (announced in the welcome message)
+    and is sent more as its frames are decoded.
+    """
     client_id = id(websocket)
     logger.info(f"Client {client_id} connected")
+    legacy_session = None
+    sessions = {}
+    closing = set()  # close() of multiplexed sessions, draining in the background
+    multiplexed = False
     
     try:
-        rec = KaldiRecognizer(model, 16000)
-        rec.SetWords(True)
-        
         # Send initial connection success message
         await websocket.send(json.dumps({
             "type": "system",
             "message": "Vosk connection established",
-            "sender": "system"
+            "sender": "system",
+            "credit_window": SESSION_QUEUE_SIZE
         }))
         
         while True:
             try:
                 data = await websocket.recv()
                 if isinstance(data, bytes):
-                    # Pass raw PCM bytes directly to Vosk
-                    if rec.AcceptWaveform(data):
-                        result = json.loads(rec.Result())
-                        if result.get("text", "").strip():
-                            print("SENDING FINAL:", result)
-                            logger.debug(f"Result for client {client_id}: {result}")
-                            await websocket.send(json.dumps({
-                                "type": "final",
-                                "text": result["text"],
-                                "sender": "system"
-                            }))
-                    else:
-                        partial = json.loads(rec.PartialResult())
-                        if partial.get("partial", "").strip():
-                            print("SENDING PARTIAL:", partial)
-                            await websocket.send(json.dumps({
-                                "type": "partial",
-                                "partial": partial["partial"],
-                                "sender": "system"
-                            }))
-                else:
+                    if multiplexed:
+                        (session_id,) = SESSION_HEADER.unpack_from(data)
+                        session = sessions.get(session_id)
+                        if session:
+                            session.offer(data[SESSION_HEADER.size:])
+                        continue
+                    # Raw PCM bytes, decoded on the session's worker thread
+                    if legacy_session is None:
+                        legacy_session = engine.open_session(websocket.send)
+                    await legacy_session.submit(data)
+                    continue
+
+                try:
+                    control = json.loads(data)
+                except json.JSONDecodeError:
+                    control = None
+                if not isinstance(control, dict):
                     logger.warning(f"Client {client_id} sent non-bytes data")
+                    continue
+                kind = control.get("type")
+                session_id = control.get("session")
+                if kind == "open":
+                    multiplexed = True
+                    sessions[session_id] = engine.open_session(websocket.send, session_id)
+                elif kind == "close":
+                    session = sessions.pop(session_id, None)
+                    if session:
+                        # Draining its queue must not hold up the other sessions
+                        task = asyncio.create_task(session.close())
+                        closing.add(task)
+                        task.add_done_callback(closing.discard)
+                elif kind == "end_of_speech":
+                    # The backend's VAD saw the end of an utterance
+                    session = sessions.get(session_id) if multiplexed else legacy_session
+                    if session:
+                        session.offer(END_OF_SPEECH)
+                else:
+                    logger.warning(f"Client {client_id} sent unknown control message: {kind}")
             except websockets.ConnectionClosed:
                 logger.info(f"Client {client_id} disconnected")
                 break
-            except Exception as e:
-                logger.error(f"Error processing data for client {client_id}: {str(e)}")
-                try:
-                    await websocket.send(json.dumps({
-                        "type": "error",
-                        "message": f"Processing error: {str(e)}",
-                        "sender": "system"
-                    }))
-                except:
-                    break
     except Exception as e:
         logger.error(f"Error in recognize for client {client_id}: {str(e)}")
     finally:
         logger.info(f"Cleaning up connection for client {client_id}")
+        if legacy_session:
+            sessions[None] = legacy_session
+        await asyncio.gather(*(session.close() for session in sessions.values()), *closing)
 
 async def main():
     try:
         async with websockets.serve(
             recognize,
-            "localhost",
-            2700,
+            HOST,
+            PORT,
             max_size=2**24,
             max_queue=32,
             ping_interval=20,  # Send ping every 20 seconds
             ping_timeout=10,   # Wait 10 seconds for pong response
             close_timeout=5    # Wait 5 seconds for close handshake
         ):
-            logger.info("Vosk WebSocket server running on ws://localhost:2700")
+            logger.info(f"Vosk WebSocket server running on ws://{HOST}:{PORT} with {WORKER_COUNT} workers")
             await asyncio.Future()  # run forever
     except Exception as e:
         logger.error(f"Server error: {str(e)}")
@@ -1,34 +1,139 @@
 import asyncio
+import json
+import os
+import sys
+import time
+
+import numpy as np
 import websockets
 import whisper
-import numpy as np
-import tempfile
-import os
-os.environ["TMPDIR"] = "D:/Projects/AI_v2.0/tmp"
+
+# Reuse the backend's streaming ffmpeg decoder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from services.audio_decoder import StreamingDecoder
+from services.whisper_batcher import WhisperBatcher
+
+SAMPLE_RATE = 16000
+STEP_SECONDS = float(os.getenv("WHISPER_STEP_SECONDS", "1.0"))  # new audio needed before re-transcribing
+WINDOW_SECONDS = 20.0  # uncommitted audio kept before we force a commit
+OVERLAP_SECONDS = 1.0  # segments ending this close to the live edge are never committed
 
 model = whisper.load_model("base")
 
+# Inference runs on the batcher's own thread so the WebSocket server stays
+# responsive, and passes from concurrent sessions share one batch
+batcher = WhisperBatcher(model, window_ms=int(os.getenv("WHISPER_BATCH_WINDOW_MS", "50")))
+
+async def run_model(audio: np.ndarray):
+    start = time.perf_counter()
+    result = await batcher.transcribe(audio)
+    return result["segments"], time.perf_counter() - start
+
+class SlidingWindowTranscriber:
+    """Transcribes a growing in-memory buffer and commits the stable prefix.
+
+    Each step re-transcribes the uncommitted audio. A segment is committed once
+    two consecutive passes agree on it and it ends at least OVERLAP_SECONDS
+    before the live edge; the buffer is then trimmed at its end, so the next
+    window starts where the committed text stops.
+    """
+
+    def __init__(self):
+        self.audio = np.zeros(0, dtype=np.float32)
+        self.offset = 0.0  # stream time of audio[0], in seconds
+        self.new_samples = 0
+        self.previous = []
+
+    def add_pcm(self, pcm: bytes):
+        samples = np.frombuffer(pcm[:len(pcm) - len(pcm) % 2], dtype=np.int16).astype(np.float32) / 32768.0
+        self.audio = np.concatenate((self.audio, samples))
+        self.new_samples += samples.size
+
+    @property
+    def ready(self) -> bool:
+        return self.new_samples >= STEP_SECONDS * SAMPLE_RATE
+
+    def snapshot(self) -> np.ndarray:
+        self.new_samples = 0
+        return self.audio.copy()
+
+    def apply(self, segments, duration: float, final: bool = False):
+        """Return (newly committed segments, partial text) for a pass over `duration` seconds."""
+        texts = [segment["text"].strip() for segment in segments]
+        stable = 0
+        for i, segment in enumerate(segments):
+            agreed = i < len(self.previous) and self.previous[i] == texts[i]
+            if not final and (not agreed or segment["end"] > duration - OVERLAP_SECONDS):
+                break
+            stable = i + 1
+        # Don't let the window grow without bound when the text keeps changing
+        if not stable and duration > WINDOW_SECONDS and len(segments) > 1:
+            stable = len(segments) - 1
+
+        committed = []
+        for segment in segments[:stable]:
+            committed.append({
+                "text": segment["text"].strip(),
+                "start": round(self.offset + segment["start"], 2),
+                "end": round(self.offset + segment["end"], 2),
+            })
+        if stable:
+            cut = min(int(segments[stable - 1]["end"] * SAMPLE_RATE), self.audio.size)
+            self.audio = self.audio[cut:]
+            self.offset += cut / SAMPLE_RATE
+        self.previous = texts[stable:]
+        return committed, " ".join(self.previous)
+
 async def transcribe(websocket):
     print("Client connected")
-    audio_chunks = []
+    decoder = StreamingDecoder(sample_rate=SAMPLE_RATE)
+    decoder.start()
+    transcriber = SlidingWindowTranscriber()
+
+    async def send_pass(final: bool = False):
+        audio = transcriber.snapshot()
+        if not audio.size:
+            return
+        segments, decode_seconds = await run_model(audio)
+        committed, partial = transcriber.apply(segments, audio.size / SAMPLE_RATE, final)
+        decode_ms = round(decode_seconds * 1000, 1)
+        print(f"Decoded {audio.size / SAMPLE_RATE:.1f}s window in {decode_ms} ms")
+        for segment in committed:
+            await websocket.send(json.dumps({"type": "final", "decode_ms": decode_ms, "sender": "system", **segment}))
+        if partial and not final:
+            await websocket.send(json.dumps({"type": "partial", "text": partial, "decode_ms": decode_ms, "sender": "system"}))
+
+    async def receive_audio():
+        try:
+            async for message in websocket:
+                if isinstance(message, bytes):
+                    await decoder.feed(message)
+        finally:
+            decoder.end_input()
+
+    async def decode_loop():
+        running = None
+        while True:
+            pcm = await decoder.read()
+            if not pcm:
+                break
+            transcriber.add_pcm(pcm)
+            # Only one pass in flight per session; audio that arrives meanwhile
+            # is picked up by the next pass
+            if transcriber.ready and (running is None or running.done()):
+                if running:
+                    running.result()
+                running = asyncio.create_task(send_pass())
+        if running:
+            await running
+        await send_pass(final=True)
+
     try:
-        async for message in websocket:
-            audio_chunks.append(message)
-            if len(audio_chunks) >= 8:  # ~2 seconds if chunked at 250ms
-                with tempfile.NamedTemporaryFile(suffix=".webm", delete=False) as f:
-                    for chunk in audio_chunks:
-                        f.write(chunk)
-                    f.flush()
-                    temp_path = f.name
-                try:
-                    result = model.transcribe(temp_path)
-                    print("Transcript:", result["text"])
-                    await websocket.send(result["text"])
-                finally:
-                    os.remove(temp_path)
-                audio_chunks.clear()
+        await asyncio.gather(receive_audio(), decode_loop())
     except websockets.ConnectionClosed:
         print("Client disconnected")
+    finally:
+        await decoder.close()
 
 async def main():
     async with websockets.serve(transcribe, "localhost", 9090, max_size=2**24, max_queue=32):
@@ -36,4 +141,4 @@ async def main():
         await asyncio.Future()  # run forever
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())